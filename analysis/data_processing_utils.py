@@ -1,4 +1,4 @@
-from typing import Optional, List, Set, Tuple
+from typing import Optional, List, Set, Tuple, Iterator
 from dataclasses import dataclass
 from collections import defaultdict
 from pathlib import Path
@@ -29,17 +29,24 @@ class DatasetDescriptor:
     separator: str = TAB
 
 
+def iter_pmids_from_unlabeled_file(
+    dataset: DatasetDescriptor,
+    separator: Optional[str] = SPACE,
+) -> Iterator[int]:
+    """Extract PMIDs from a file, one row at a time"""
+    with dataset.path.open() as f:
+        for row in f:
+            row = row.strip().split(separator)
+            if row:
+                yield int(row[0])
+
+
 def get_pmids_from_unlabeled_file(
     dataset: DatasetDescriptor,
     separator: Optional[str] = SPACE,
 ) -> List[int]:
     """Extract PMIDs from a file"""
-    with dataset.path.open() as f:
-        rows = [
-            row.strip().split(separator) for row in f
-        ]
-
-    return [int(row[0]) for row in rows if row]
+    return list(iter_pmids_from_unlabeled_file(dataset, separator))
 
 
 def get_pmids_from_labeled_file(path: Path, separator: Optional[str] = SPACE) -> List[Tuple[int, str]]:
@@ -76,9 +83,16 @@ def get_labeled_data(dataset_descriptor: DatasetDescriptor) -> Tuple[List[int],
     return pmids, list(pmid_clusters_by_label_id.values())
 
 
-def get_abstracts(pmids: List[int], limit: Optional[int] = None) -> List[Abstract]:
+def create_processor(**kwargs) -> CachingPubMedProcessor:
+    """Create a processor backed by the default cache directory"""
+    return CachingPubMedProcessor(cache_dir=Path(data_dir, DEFAULT_CACHEDIR_NAME), **kwargs)
+
+
+def get_abstracts(
+    pmids: List[int], limit: Optional[int] = None, processor: Optional[CachingPubMedProcessor] = None
+) -> List[Abstract]:
     """Fetch abstract from PubMed"""
-    processor = CachingPubMedProcessor(cache_dir=Path(data_dir, DEFAULT_CACHEDIR_NAME))
+    processor = processor or create_processor()
 
     abstracts = []
     missed_pmids = []
@@ -5,6 +5,8 @@ from pathlib import Path
 from collections import Counter
 import h5py
 
+from pubmed.file_lib import write_atomically
+
 import logging
 
 log = logging.getLogger(__name__)
@@ -23,6 +25,13 @@ class Abstract:
 
         self.counts: Optional[Counter[str]] = Counter()
 
+    @classmethod
+    def from_counts(cls, pmid: int, counts: Counter) -> Abstract:
+        """Create an abstract holding only its language model"""
+        abstract = cls(pmid=pmid)
+        abstract.counts = counts
+        return abstract
+
     @property
     def terms(self) -> Set[str]:
         """Obtain the terms comprising the abstract's language model"""
@@ -39,11 +48,15 @@ class Abstract:
     def save(self, directory: str):
         path = Path(directory, "{pmid}.{suffix}".format(pmid=self.pmid, suffix=self.SUFFIX))
 
-        with h5py.File(path, "w") as f:
-            f.create_dataset(name=self._KEY_PMID, data=self.pmid, dtype=int)
-            for key, value in self.fields.items():
-                log.info("save: %s | %s: %s", type(value), key, value)
-                f.create_dataset(name=key, data=value)
+        def write(temporary_path: Path):
+            with h5py.File(temporary_path, "w") as f:
+                f.create_dataset(name=self._KEY_PMID, data=self.pmid, dtype=int)
+                for key, value in self.fields.items():
+                    log.info("save: %s | %s: %s", type(value), key, value)
+                    f.create_dataset(name=key, data=value)
+
+        # readers of a shared cache never observe a partially written file
+        write_atomically(path, write)
 
     @classmethod
     def load(cls, path: str) -> Abstract:
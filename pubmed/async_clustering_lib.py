@@ -0,0 +1,189 @@
+from typing import List, Set, Dict, Tuple, Optional, Iterable
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor
+import asyncio
+import weakref
+
+from pubmed.abstract_lib import Abstract
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pipeline_lib import iter_unique_pmids
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from pubmed.pubmed_extractor_lib import AbstractProcessingException
+from analysis.data_processing_utils import DatasetDescriptor, create_processor, iter_pmids_from_unlabeled_file
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def _build_language_models(language_model_builder: LanguageModelBuilder, abstracts: List[Abstract]) -> List[Counter]:
+    """Build the language models of the abstracts, in an executor"""
+    return [language_model_builder.build_language_model(abstract) for abstract in abstracts]
+
+
+class AsyncPubMedTermBasedClusterer:
+    """Cluster from asyncio code without blocking the event loop: abstracts are fetched as
+    concurrent awaitables, each bounded by a timeout from when it starts, and tokenization and
+    clustering run in an executor. Concurrent jobs share the clusterer's processor and caches, and
+    an abstract requested by several jobs at once is fetched once.
+
+    Blocking fetches run in a pool of threads, since the processor is synchronous; a cancelled
+    job stops waiting for its fetches, which complete in the background and are cached. The CPU
+    stages run in `cpu_executor`: by default the thread pool of the event loop, which keeps the
+    loop responsive but scores under the GIL, so pass a process pool to score in parallel; only
+    the scorer, lexicon and language models are sent to it"""
+
+    DEFAULT_MAX_CONCURRENT_FETCHES = 16
+
+    # the number of seconds after which a fetch is abandoned and the article treated as missing
+    DEFAULT_FETCH_TIMEOUT = 60.0
+
+    def __init__(
+        self,
+        clusterer: PubMedTermBasedClusterer,
+        cpu_executor: Optional[Executor] = None,
+        max_concurrent_fetches: int = DEFAULT_MAX_CONCURRENT_FETCHES,
+        fetch_timeout: Optional[float] = DEFAULT_FETCH_TIMEOUT,
+    ):
+        if clusterer.processor is None:
+            clusterer.processor = create_processor()
+
+        self.clusterer = clusterer
+        self.cpu_executor = cpu_executor
+        self.max_concurrent_fetches = max_concurrent_fetches
+        self.fetch_executor = ThreadPoolExecutor(max_workers=max_concurrent_fetches)
+        self.fetch_timeout = fetch_timeout
+
+        # the fetches in progress, shared by the jobs requesting the same article
+        self._fetches: Dict[int, asyncio.Future] = {}
+
+        # the free threads of the fetch executor, for each event loop from which jobs are run
+        self._fetch_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _get_fetch_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._fetch_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._fetch_semaphores[loop] = asyncio.Semaphore(self.max_concurrent_fetches)
+        return semaphore
+
+    async def _fetch_abstract(self, pmid: int) -> Optional[Abstract]:
+        # a fetch is only submitted once a thread is free to start it, so that the timeout covers the
+        # fetch alone rather than the time spent waiting behind the fetches of every job
+        semaphore = self._get_fetch_semaphore()
+        await semaphore.acquire()
+
+        def release(fetch: asyncio.Future):
+            # the thread is busy until an abandoned fetch completes, so it is only then released
+            semaphore.release()
+            # retrieved, so that the failure of an abandoned fetch is not reported as unhandled
+            if not fetch.cancelled():
+                fetch.exception()
+
+        loop = asyncio.get_running_loop()
+        fetch = loop.run_in_executor(self.fetch_executor, self.clusterer.processor.get_abstract, pmid)
+        fetch.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(fetch), timeout=self.fetch_timeout)
+        except AbstractProcessingException as exc:
+            log.warning(exc)
+        except asyncio.TimeoutError:
+            log.warning("timed out after %ss retrieving article %s", self.fetch_timeout, pmid)
+        return None
+
+    async def get_abstract(self, pmid: int) -> Optional[Abstract]:
+        """Get the abstract of an article, or None if it has none or could not be retrieved in time"""
+        processor = self.clusterer.processor
+
+        # cached abstracts and known misses are resolved without leaving the event loop
+        abstract = processor.cache.get(pmid)
+        if abstract is not None:
+            return abstract
+        if processor.get_miss(pmid):
+            return None
+
+        fetch = self._fetches.get(pmid)
+        if fetch is None:
+            fetch = self._fetches[pmid] = asyncio.ensure_future(self._fetch_abstract(pmid))
+            fetch.add_done_callback(lambda _: self._fetches.pop(pmid, None))
+
+        # cancelling one job must not cancel the fetch for the others awaiting it
+        return await asyncio.shield(fetch)
+
+    async def get_abstracts(self, pmids: Iterable[int]) -> List[Abstract]:
+        """Get the abstracts of the articles concurrently, in order, skipping articles without one"""
+        pmids = list(pmids)
+        abstracts = await asyncio.gather(*(self.get_abstract(pmid) for pmid in pmids))
+
+        missed_pmids = [pmid for pmid, abstract in zip(pmids, abstracts) if abstract is None]
+        if missed_pmids:
+            log.warning("missing articles %s", missed_pmids)
+
+        return [abstract for abstract in abstracts if abstract is not None]
+
+    async def _get_language_model_or_abstract(self, pmid: int) -> Tuple[Optional[Counter], Optional[Abstract]]:
+        # a cached language model makes the abstract unnecessary
+        language_model_cache = self.clusterer.language_model_cache
+        if language_model_cache is not None:
+            counts = language_model_cache.get(pmid)
+            if counts is not None:
+                return counts, None
+
+        return None, await self.get_abstract(pmid)
+
+    async def build_abstracts_from_pmids(self, pmids: Iterable[int]) -> List[Abstract]:
+        """Generate each abstract's language model, holding only the language model"""
+        pmids = list(iter_unique_pmids(pmids))
+        results = await asyncio.gather(*(self._get_language_model_or_abstract(pmid) for pmid in pmids))
+
+        # the language models not cached are built together, in the executor
+        uncached_abstracts = [abstract for counts, abstract in results if counts is None and abstract is not None]
+        built_counts = await asyncio.get_running_loop().run_in_executor(
+            self.cpu_executor, _build_language_models, self.clusterer.language_model_builder, uncached_abstracts
+        )
+        counts_by_pmid = {abstract.pmid: counts for abstract, counts in zip(uncached_abstracts, built_counts)}
+
+        language_model_cache = self.clusterer.language_model_cache
+        if language_model_cache is not None:
+            for pmid, counts in counts_by_pmid.items():
+                language_model_cache.put(pmid, counts)
+
+        abstracts = []
+        missed_pmids = []
+        for pmid, (counts, _) in zip(pmids, results):
+            counts = counts if counts is not None else counts_by_pmid.get(pmid)
+            if counts is None:
+                missed_pmids.append(pmid)
+                continue
+
+            abstracts.append(Abstract.from_counts(pmid, counts))
+
+        if missed_pmids:
+            log.warning("missing articles %s", missed_pmids)
+
+        if self.clusterer.document_frequency_filter:
+            self.clusterer.document_frequency_filter.prune(abstracts)
+
+        return abstracts
+
+    async def predict_clusters_from_pmids(self, pmids: Iterable[int]) -> List[Set[int]]:
+        """Cluster the specified articles given their abstracts"""
+        abstracts = await self.build_abstracts_from_pmids(pmids)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.cpu_executor,
+            PubMedTermBasedClusterer.cluster_language_models,
+            abstracts,
+            self.clusterer.scorer,
+            self.clusterer.duplicate_detector,
+        )
+
+    async def predict_clusters(self, dataset: DatasetDescriptor) -> List[Set[int]]:
+        """Cluster the provided articles given their abstracts"""
+        pmids = await asyncio.get_running_loop().run_in_executor(
+            self.fetch_executor, lambda: list(iter_pmids_from_unlabeled_file(dataset))
+        )
+        return await self.predict_clusters_from_pmids(pmids)
+
+    def shutdown(self):
+        """Stop the threads fetching abstracts, once the fetches in progress complete"""
+        self.fetch_executor.shutdown(wait=True)
@@ -0,0 +1,113 @@
+from typing import List, Set, Dict, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+import glob
+import os
+
+from pubmed.language_model_builder import LanguageModelCache
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from pubmed.output_lib import open_cluster_writer
+from analysis.data_processing_utils import DatasetDescriptor, create_processor, get_pmids_from_unlabeled_file
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+    dataset: DatasetDescriptor
+    output_path: Path
+    clusters: List[Set[int]]
+
+
+def expand_dataset_paths(patterns: Iterable[str]) -> List[Path]:
+    """Expand the glob patterns into the paths of the dataset files they match, in order and
+    without repetition"""
+    paths: Dict[Path, Path] = {}
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for match in matches:
+            path = Path(match)
+            if not path.is_file():
+                raise FileNotFoundError("no dataset file matches: {}".format(match))
+            paths.setdefault(path.resolve(), path)
+    return list(paths.values())
+
+
+class BatchClusterer:
+    """Cluster many datasets with a single clusterer, sharing its processor, lexicon and language
+    model cache, such that PMIDs appearing in several datasets are fetched and tokenized once"""
+
+    OUTPUT_SUFFIX = ".clusters.tsv"
+
+    DEFAULT_NUM_WORKERS = 4
+
+    def __init__(self, clusterer: PubMedTermBasedClusterer, num_workers: int = DEFAULT_NUM_WORKERS):
+        if clusterer.processor is None:
+            clusterer.processor = create_processor()
+
+        # every language model of the batch is retained until the batch completes
+        if clusterer.language_model_cache is None:
+            clusterer.language_model_cache = LanguageModelCache(max_size=None)
+
+        self.clusterer = clusterer
+        self.num_workers = num_workers
+
+    @classmethod
+    def get_output_paths(cls, datasets: List[DatasetDescriptor], output_dir: Path) -> List[Path]:
+        """Name the output of each dataset by its path relative to the common parent of the datasets,
+        such that datasets of the same name in different directories are written to different files"""
+        dataset_paths = [Path(dataset.path).resolve() for dataset in datasets]
+        common_parent = Path(os.path.commonpath([path.parent for path in dataset_paths])) if dataset_paths else None
+
+        output_paths = [
+            Path(output_dir, path.relative_to(common_parent).with_name(path.name + cls.OUTPUT_SUFFIX))
+            for path in dataset_paths
+        ]
+
+        # only the same file listed twice, e.g., through a link, can collide
+        if len(set(output_paths)) < len(output_paths):
+            raise ValueError("datasets are listed more than once: {}".format([str(path) for path in dataset_paths]))
+        return output_paths
+
+    def _cluster_dataset(self, dataset: DatasetDescriptor, pmids: List[int], output_path: Path) -> BatchResult:
+        clusters = self.clusterer.predict_clusters_from_pmids(pmids)
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.write_clusters(clusters, output_path)
+        log.info("clustered %s pmids from %s into %s", len(pmids), dataset.path, output_path)
+
+        return BatchResult(dataset=dataset, output_path=output_path, clusters=clusters)
+
+    @staticmethod
+    def write_clusters(clusters: List[Set[int]], output_path: Path):
+        """Write a row of cluster id and PMID for each member of each cluster"""
+        with open_cluster_writer("tsv", str(output_path)) as writer:
+            writer.write_clusters(clusters)
+
+    def run(self, datasets: List[DatasetDescriptor], output_dir: Path) -> List[BatchResult]:
+        """Cluster each dataset, writing the clusters of each to the output directory"""
+        output_paths = self.get_output_paths(datasets, output_dir)
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+        # read as by the cluster command, so that each dataset is clustered as it would be alone
+        pmids_by_dataset = [get_pmids_from_unlabeled_file(dataset) for dataset in datasets]
+
+        # build the language model of every distinct pmid once, before any dataset is clustered
+        unique_pmids = list(dict.fromkeys(pmid for pmids in pmids_by_dataset for pmid in pmids))
+        log.info(
+            "building language models for %s distinct of %s pmids in %s datasets",
+            len(unique_pmids),
+            sum(len(pmids) for pmids in pmids_by_dataset),
+            len(datasets),
+        )
+        self.clusterer.prefetch(unique_pmids)
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            futures = [
+                executor.submit(self._cluster_dataset, dataset, pmids, output_path)
+                for dataset, pmids, output_path in zip(datasets, pmids_by_dataset, output_paths)
+            ]
+            return [future.result() for future in futures]
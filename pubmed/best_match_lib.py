@@ -0,0 +1,150 @@
+from typing import List, Dict, Tuple, Any
+from collections import defaultdict
+import math
+
+from pubmed.abstract_lib import Abstract
+from pubmed.scorer_lib import BaseScorer
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class BoundedBestMatchSearch:
+    """Find the best match of each abstract among the others, as exhaustive scoring would, but
+    without scoring the abstracts that cannot match best, in the style of max-score.
+
+    The target's terms are processed in descending order of the most any abstract can gain from
+    each (the target's count times the term's maximum count), accumulating partial scores over
+    the postings of each term. Once the gains of the remaining terms cannot lift an abstract not
+    yet seen above the best partial score, no further abstracts are admitted. Of those admitted,
+    only the abstracts whose partial score plus the remaining gains, and whose norm bound, can
+    reach the best score found so far are scored exactly.
+
+    Scores are only bounded if they are dot products of nonnegative counts, such that partial
+    scores never exceed final scores; see `is_applicable`"""
+
+    # the relative error tolerated in norm bounds, which are computed in floating point
+    NORM_TOLERANCE = 1e-9
+
+    # the number of a target's terms, of the highest weight, from which an approximate best match is found
+    NUM_APPROXIMATE_TERMS = 3
+
+    def __init__(self, abstracts: List[Abstract], scorer: BaseScorer):
+        self.abstracts = abstracts
+        self.scorer = scorer
+
+        self.postings: Dict[Any, List[Tuple[int, int]]] = defaultdict(list)
+        for position, abstract in enumerate(abstracts):
+            for term, count in abstract.counts.items():
+                self.postings[term].append((position, count))
+
+        self.max_counts = {term: max(count for _, count in postings) for term, postings in self.postings.items()}
+        self.norms = [math.sqrt(sum(count * count for count in abstract.counts.values())) for abstract in abstracts]
+
+        # the pairs of target and candidate abstracts, and those scored exactly
+        self.num_pairs = 0
+        self.num_scored = 0
+
+    def _get_first_other_abstract(self, target: Abstract) -> Tuple[Abstract, float]:
+        best_abstract = next(abstract for abstract in self.abstracts if abstract is not target)
+        return best_abstract, self.scorer.get_score(target_abstract=target, model_abstract=best_abstract)
+
+    def find_first_other_match(self, position: int) -> Tuple[Abstract, float]:
+        """Find the first abstract other than that at the position, and its score: a best match found
+        in constant time, for when not even an approximation can be afforded"""
+        return self._get_first_other_abstract(self.abstracts[position])
+
+    @staticmethod
+    def is_applicable(abstracts: List[Abstract], scorer: BaseScorer) -> bool:
+        """Whether the scores can be bounded: hashed language models may have negative counts"""
+        return (
+            scorer.IS_DOT_PRODUCT
+            and len(abstracts) > 1
+            and all(count >= 0 for abstract in abstracts for count in abstract.counts.values())
+        )
+
+    @property
+    def pruned_fraction(self) -> float:
+        return 1 - self.num_scored / self.num_pairs if self.num_pairs else 0.0
+
+    def find_best_match(self, position: int) -> Tuple[Abstract, float]:
+        """Find the abstract with the highest score for the abstract at the position, other than
+        itself, breaking ties in favor of the first, as `max` would"""
+        abstracts = self.abstracts
+        target = abstracts[position]
+        self.num_pairs += len(abstracts) - 1
+
+        # the most any abstract can gain from each of the target's terms
+        gains = sorted(
+            ((count * self.max_counts[term], term, count) for term, count in target.counts.items()),
+            key=lambda gain: gain[0],
+            reverse=True,
+        )
+        remaining_gain = sum(gain for gain, _, _ in gains)
+
+        # a lower bound of the best score: the partial score of another abstract
+        threshold = 0
+        partial_scores: Dict[int, int] = {}
+        for gain, term, count in gains:
+            # an abstract not yet seen scores at most the remaining gains; as it would lose any tie to
+            # the abstract reaching the threshold, only if it could score more is it admitted
+            if remaining_gain < threshold:
+                break
+            remaining_gain -= gain
+
+            for candidate, candidate_count in self.postings[term]:
+                score = partial_scores.get(candidate, 0) + count * candidate_count
+                partial_scores[candidate] = score
+                if score > threshold and abstracts[candidate] is not target:
+                    threshold = score
+
+        target_norm = self.norms[position] * (1 + self.NORM_TOLERANCE)
+
+        best_position = None
+        best_score = 0
+        # candidates with the highest partial scores are scored first, raising the best score soonest
+        for candidate, partial_score in sorted(partial_scores.items(), key=lambda item: (-item[1], item[0])):
+            if partial_score + remaining_gain < best_score:
+                break
+            if abstracts[candidate] is target or target_norm * self.norms[candidate] < best_score:
+                continue
+
+            score = self.scorer.get_score(target_abstract=target, model_abstract=abstracts[candidate])
+            self.num_scored += 1
+
+            if score > best_score or (score == best_score and best_position is not None and candidate < best_position):
+                best_position, best_score = candidate, score
+
+        if best_position is None:
+            # every other abstract scores 0, and the first of them is the best match
+            return self._get_first_other_abstract(target)
+
+        return abstracts[best_position], best_score
+
+    def find_approximate_best_match(
+        self, position: int, num_terms: int = NUM_APPROXIMATE_TERMS
+    ) -> Tuple[Abstract, float]:
+        """Find the abstract sharing the most weight with the abstract at the position over only its
+        `num_terms` terms of the highest weight, and its exact score, for any scorer"""
+        abstracts = self.abstracts
+        target = abstracts[position]
+
+        terms = sorted(target.counts.items(), key=lambda item: abs(item[1]), reverse=True)[:num_terms]
+
+        partial_scores: Dict[int, int] = {}
+        for term, count in terms:
+            for candidate, candidate_count in self.postings[term]:
+                partial_scores[candidate] = partial_scores.get(candidate, 0) + count * candidate_count
+
+        candidates = [
+            (-partial_score, candidate)
+            for candidate, partial_score in partial_scores.items()
+            if partial_score > 0 and abstracts[candidate] is not target
+        ]
+        if not candidates:
+            return self._get_first_other_abstract(target)
+
+        _, best_position = min(candidates)
+        best_abstract = abstracts[best_position]
+        return best_abstract, self.scorer.get_score(target_abstract=target, model_abstract=best_abstract)
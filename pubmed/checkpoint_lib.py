@@ -0,0 +1,114 @@
+from typing import List, Tuple, Dict, Any, Optional
+from pathlib import Path
+import json
+
+from pubmed.abstract_lib import Abstract
+from pubmed.columnar_lib import save_language_models, load_language_models
+from pubmed.file_lib import write_atomically
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class CheckpointMismatchException(ValueError):
+    pass
+
+
+class ClusteringCheckpoint:
+    """The progress of a clustering run, saved to a directory after each stage: the requested PMIDs
+    and the options of the clusterer, the language models built for them, and the best matches of
+    each block of rows. Each file is written atomically, so that a run may be interrupted at any
+    time and resumed from the last completed stage or block"""
+
+    FILENAME_PMIDS = "pmids.json"
+    FILENAME_OPTIONS = "options.json"
+    FILENAME_LANGUAGE_MODELS = "language_models.h5"
+    FILENAME_BEST_MATCHES = "best_matches_{block:06d}.json"
+    PATTERN_BEST_MATCHES = "best_matches_*.json"
+
+    DEFAULT_BLOCK_SIZE = 500
+
+    def __init__(self, directory: str, block_size: int = DEFAULT_BLOCK_SIZE, resume: bool = False):
+        if block_size < 1:
+            raise ValueError("block_size must be positive: {}".format(block_size))
+
+        self.directory = Path(directory)
+        self.block_size = block_size
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not resume:
+            self.reset()
+
+    def reset(self):
+        """Discard any progress previously saved to the directory"""
+        for path in self.directory.glob(self.PATTERN_BEST_MATCHES):
+            path.unlink()
+        for filename in (self.FILENAME_PMIDS, self.FILENAME_OPTIONS, self.FILENAME_LANGUAGE_MODELS):
+            Path(self.directory, filename).unlink(missing_ok=True)
+
+    def _write_json(self, filename: str, payload):
+        def write(path: Path):
+            with path.open("w") as f:
+                json.dump(payload, f)
+
+        write_atomically(Path(self.directory, filename), write)
+
+    def _read_json(self, filename: str):
+        path = Path(self.directory, filename)
+        if not path.exists():
+            return None
+        with path.open() as f:
+            return json.load(f)
+
+    def check_pmids(self, pmids: List[int]):
+        """Save the requested PMIDs or, if resuming, ensure that they are those of the saved run"""
+        saved_pmids = self._read_json(self.FILENAME_PMIDS)
+        if saved_pmids is None:
+            self._write_json(self.FILENAME_PMIDS, pmids)
+        elif saved_pmids != pmids:
+            raise CheckpointMismatchException("checkpoint in {} is of different pmids".format(self.directory))
+
+    def check_options(self, options: Dict[str, Any]):
+        """Save the options on which the saved progress depends or, if resuming, ensure that they are
+        those of the saved run, so that progress made with different options is never combined"""
+        # compared as saved, such that tuples and lists are alike
+        options = json.loads(json.dumps(options, sort_keys=True))
+
+        saved_options = self._read_json(self.FILENAME_OPTIONS)
+        if saved_options is None:
+            self._write_json(self.FILENAME_OPTIONS, options)
+        elif saved_options != options:
+            names = sorted(name for name in {*saved_options, *options} if saved_options.get(name) != options.get(name))
+            raise CheckpointMismatchException(
+                "checkpoint in {} is of different options: {}".format(self.directory, ", ".join(names))
+            )
+
+    def save_language_models(self, abstracts: List[Abstract]):
+        write_atomically(
+            Path(self.directory, self.FILENAME_LANGUAGE_MODELS), lambda path: save_language_models(abstracts, str(path))
+        )
+
+    def load_language_models(self) -> Optional[List[Abstract]]:
+        path = Path(self.directory, self.FILENAME_LANGUAGE_MODELS)
+        if not path.exists():
+            return None
+        log.info("resuming from language models in %s", path)
+        return load_language_models(str(path))
+
+    def save_best_matches(self, block: int, num_abstracts: int, best_matches: List[Tuple[int, float]]):
+        """Save the position and score of the best match of each row in the block"""
+        self._write_json(
+            self.FILENAME_BEST_MATCHES.format(block=block),
+            {"num_abstracts": num_abstracts, "block_size": self.block_size, "best_matches": best_matches},
+        )
+
+    def load_best_matches(self, block: int, num_abstracts: int) -> Optional[List[Tuple[int, float]]]:
+        payload = self._read_json(self.FILENAME_BEST_MATCHES.format(block=block))
+        if payload is None:
+            return None
+
+        if payload["num_abstracts"] != num_abstracts or payload["block_size"] != self.block_size:
+            raise CheckpointMismatchException("best matches in {} are of a different run".format(self.directory))
+
+        return [(position, score) for position, score in payload["best_matches"]]
@@ -1,6 +1,7 @@
-from typing import Dict
+from typing import Dict, List, Set, Optional
 
 from collections import Counter
+from dataclasses import dataclass
 
 
 class Cluster:
@@ -22,3 +23,27 @@ class Cluster:
 
     def __repr__(self):
         return "<cluster {}>".format(self.id)
+
+
+@dataclass
+class Assignment:
+    """The cluster to which an abstract was assigned, along with its best match and their score"""
+
+    pmid: int
+    cluster_id: int
+    best_match: Optional[int]
+    score: float
+
+
+@dataclass
+class DeadlineClustering:
+    """The clusters found before a deadline, along with the number of abstracts whose best match was
+    sought and the number of those whose best match was found exactly, rather than approximated"""
+
+    clusters: List[Set[int]]
+    num_rows: int
+    num_refined: int
+
+    @property
+    def refined_fraction(self) -> float:
+        return self.num_refined / self.num_rows if self.num_rows else 1.0
@@ -0,0 +1,160 @@
+from typing import List, Dict, Optional, Any
+from collections import Counter
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from pubmed.abstract_lib import Abstract
+from pubmed.cluster_lib import Assignment
+
+import logging
+
+log = logging.getLogger(__name__)
+
+DEFAULT_COMPRESSION = "gzip"
+
+GROUP_VOCABULARY = "vocabulary"
+GROUP_MODELS = "models"
+GROUP_ASSIGNMENTS = "assignments"
+
+ATTR_TERM_TYPE = "term_type"
+
+# the best match of an abstract without one, e.g., the only abstract of a dataset
+NO_BEST_MATCH = -1
+
+
+def create_column(group: h5py.Group, name: str, data: Any, compression: Optional[str], dtype=None):
+    """Create a dataset of the values of a column in the group; without compression, it is stored
+    contiguously"""
+    data = np.asarray(data, dtype=dtype)
+    if compression and len(data):
+        group.create_dataset(name, data=data, dtype=data.dtype, compression=compression, shuffle=True, chunks=True)
+    else:
+        group.create_dataset(name, data=data, dtype=data.dtype)
+
+
+def _decode(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def save_vocabulary(f: h5py.Group, terms: List[Any], compression: Optional[str]):
+    """Save the terms of language models in order, such that they can be referred to by position"""
+    # the terms of hashed language models are bucket numbers rather than strings
+    term_type = "int" if terms and all(isinstance(term, int) for term in terms) else "str"
+
+    vocabulary = f.create_group(GROUP_VOCABULARY)
+    vocabulary.attrs[ATTR_TERM_TYPE] = term_type
+    if term_type == "int":
+        create_column(vocabulary, "term", terms, compression, dtype=np.int64)
+    else:
+        create_column(vocabulary, "term", [str(term) for term in terms], compression, dtype=h5py.string_dtype())
+
+
+def load_vocabulary(f: h5py.Group) -> List[Any]:
+    """Load the terms saved by `save_vocabulary`, in order"""
+    vocabulary = f[GROUP_VOCABULARY]
+    terms = vocabulary["term"][()].tolist()
+    if vocabulary.attrs[ATTR_TERM_TYPE] != "int":
+        terms = [_decode(term) for term in terms]
+    return terms
+
+
+def save_language_models(abstracts: List[Abstract], path: str, compression: Optional[str] = DEFAULT_COMPRESSION):
+    """Save the language models of the abstracts, in order, as columns of (pmid, term id, count)
+    with a shared vocabulary of terms; without compression, the columns are stored contiguously
+    and can be memory-mapped"""
+    term_ids: Dict[Any, int] = {}
+
+    offsets = [0]
+    pmid_column: List[int] = []
+    term_id_column: List[int] = []
+    count_column: List[int] = []
+    for abstract in abstracts:
+        for term, count in abstract.counts.items():
+            pmid_column.append(abstract.pmid)
+            term_id_column.append(term_ids.setdefault(term, len(term_ids)))
+            count_column.append(count)
+        offsets.append(len(count_column))
+
+    terms = list(term_ids)
+
+    with h5py.File(Path(path), "w") as f:
+        save_vocabulary(f, terms, compression)
+
+        models = f.create_group(GROUP_MODELS)
+        create_column(models, "pmid", pmid_column, compression, dtype=np.int64)
+        create_column(models, "term_id", term_id_column, compression, dtype=np.int32)
+        create_column(models, "count", count_column, compression, dtype=np.int64)
+
+        # the row at which each abstract's entries begin, which also preserves the order of the
+        # abstracts and those with empty language models
+        create_column(models, "abstract_pmid", [abstract.pmid for abstract in abstracts], compression, dtype=np.int64)
+        create_column(models, "abstract_offset", offsets, compression, dtype=np.int64)
+
+    log.info("saved %s language models with %s terms to %s", len(abstracts), len(terms), path)
+
+
+def load_language_models(path: str) -> List[Abstract]:
+    """Load abstracts holding only the language models saved to the specified path"""
+    with h5py.File(Path(path), "r") as f:
+        terms = load_vocabulary(f)
+
+        models = f[GROUP_MODELS]
+        term_ids = models["term_id"][()].tolist()
+        counts = models["count"][()].tolist()
+        abstract_pmids = models["abstract_pmid"][()].tolist()
+        offsets = models["abstract_offset"][()].tolist()
+
+    abstracts = []
+    for i, pmid in enumerate(abstract_pmids):
+        start, end = offsets[i], offsets[i + 1]
+
+        counts_by_term = Counter(dict(zip((terms[term_id] for term_id in term_ids[start:end]), counts[start:end])))
+        abstracts.append(Abstract.from_counts(pmid, counts_by_term))
+
+    return abstracts
+
+
+def save_assignments(assignments: List[Assignment], path: str, compression: Optional[str] = DEFAULT_COMPRESSION):
+    """Save the cluster id, best match and score of each abstract"""
+    with h5py.File(Path(path), "w") as f:
+        group = f.create_group(GROUP_ASSIGNMENTS)
+        create_column(group, "pmid", [a.pmid for a in assignments], compression, dtype=np.int64)
+        create_column(group, "cluster_id", [a.cluster_id for a in assignments], compression, dtype=np.int64)
+        create_column(
+            group,
+            "best_match",
+            [NO_BEST_MATCH if a.best_match is None else a.best_match for a in assignments],
+            compression,
+            dtype=np.int64,
+        )
+        create_column(group, "score", [a.score for a in assignments], compression, dtype=np.float64)
+
+
+def load_assignments(path: str) -> List[Assignment]:
+    with h5py.File(Path(path), "r") as f:
+        group = f[GROUP_ASSIGNMENTS]
+        columns = [group[name][()].tolist() for name in ("pmid", "cluster_id", "best_match", "score")]
+
+    return [
+        Assignment(
+            pmid=pmid,
+            cluster_id=cluster_id,
+            best_match=None if best_match == NO_BEST_MATCH else best_match,
+            score=score,
+        )
+        for pmid, cluster_id, best_match, score in zip(*columns)
+    ]
+
+
+def memory_map_column(path: str, name: str) -> np.ndarray:
+    """Memory-map a column (e.g., "models/count") of a file saved without compression"""
+    with h5py.File(Path(path), "r") as f:
+        dataset = f[name]
+        offset = dataset.id.get_offset()
+        if offset is None or dataset.chunks is not None:
+            raise ValueError("column {} of {} is not stored contiguously".format(name, path))
+        dtype, shape = dataset.dtype, dataset.shape
+
+    return np.memmap(path, mode="r", dtype=dtype, shape=shape, offset=offset)
@@ -0,0 +1,100 @@
+from typing import List, Set, Any, Optional
+from collections import Counter
+from dataclasses import dataclass
+
+from pubmed.abstract_lib import Abstract
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PruningReport:
+    num_abstracts: int
+    num_terms: int
+    num_terms_kept: int
+    num_nonzeros: int
+    num_nonzeros_kept: int
+
+    @property
+    def vocabulary_reduction(self) -> float:
+        return 1 - self.num_terms_kept / self.num_terms if self.num_terms else 0.0
+
+    @property
+    def nonzero_reduction(self) -> float:
+        return 1 - self.num_nonzeros_kept / self.num_nonzeros if self.num_nonzeros else 0.0
+
+
+class DocumentFrequencyFilter:
+    """Drop the terms occurring in fewer than `min_document_frequency` abstracts of a corpus, or in
+    more than `max_document_fraction` of them, from every language model of the corpus.
+
+    Terms of a single abstract never contribute to a score, so the default minimum of 2 changes no
+    scores; ubiquitous terms contribute large, uninformative products and long postings"""
+
+    DEFAULT_MIN_DOCUMENT_FREQUENCY = 2
+
+    def __init__(
+        self,
+        min_document_frequency: int = DEFAULT_MIN_DOCUMENT_FREQUENCY,
+        max_document_fraction: Optional[float] = None,
+    ):
+        if min_document_frequency < 1:
+            raise ValueError("min_document_frequency must be positive: {}".format(min_document_frequency))
+        if max_document_fraction is not None and not 0 < max_document_fraction <= 1:
+            raise ValueError("max_document_fraction must be in (0, 1]: {}".format(max_document_fraction))
+
+        self.min_document_frequency = min_document_frequency
+        self.max_document_fraction = max_document_fraction
+
+    def get_kept_terms(self, abstracts: List[Abstract]) -> Set[Any]:
+        """Obtain the terms of the corpus whose document frequency is within the thresholds"""
+        document_frequencies = Counter()
+        for abstract in abstracts:
+            document_frequencies.update(abstract.counts.keys())
+
+        max_document_frequency = len(abstracts)
+        if self.max_document_fraction is not None:
+            max_document_frequency = self.max_document_fraction * len(abstracts)
+
+        return {
+            term
+            for term, document_frequency in document_frequencies.items()
+            if self.min_document_frequency <= document_frequency <= max_document_frequency
+        }
+
+    def prune(self, abstracts: List[Abstract]) -> PruningReport:
+        """Replace the language model of each abstract with one keeping only the terms within the
+        thresholds; the previous language models, which may be shared with a cache, are unchanged"""
+        kept_terms = self.get_kept_terms(abstracts)
+
+        terms: Set[Any] = set()
+        num_nonzeros = 0
+        num_nonzeros_kept = 0
+        for abstract in abstracts:
+            counts = abstract.counts
+            terms.update(counts.keys())
+            num_nonzeros += len(counts)
+
+            abstract.counts = Counter({term: count for term, count in counts.items() if term in kept_terms})
+            num_nonzeros_kept += len(abstract.counts)
+
+        report = PruningReport(
+            num_abstracts=len(abstracts),
+            num_terms=len(terms),
+            num_terms_kept=len(kept_terms),
+            num_nonzeros=num_nonzeros,
+            num_nonzeros_kept=num_nonzeros_kept,
+        )
+        log.info(
+            "pruned the vocabulary of %s abstracts from %s to %s terms (%.1f%%) and from %s to %s nonzeros (%.1f%%)",
+            report.num_abstracts,
+            report.num_terms,
+            report.num_terms_kept,
+            100 * report.vocabulary_reduction,
+            report.num_nonzeros,
+            report.num_nonzeros_kept,
+            100 * report.nonzero_reduction,
+        )
+        return report
@@ -0,0 +1,128 @@
+from typing import List, Set, Dict, Any
+from collections import defaultdict
+import hashlib
+
+from pubmed.abstract_lib import Abstract
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class DuplicateDetector:
+    """Collapse abstracts whose language models are identical or nearly identical (e.g., errata,
+    reprints or the same abstract under different PMIDs) into a single representative"""
+
+    SIMHASH_BITS = 64
+
+    # the similarity hash is split into bands; by the pigeonhole principle, two hashes that differ
+    # in fewer bits than there are bands must agree exactly on at least one band
+    NUM_BANDS = 4
+
+    def __init__(self, max_hamming_distance: int = 3):
+        if max_hamming_distance >= self.NUM_BANDS:
+            raise ValueError("max_hamming_distance must be less than {}".format(self.NUM_BANDS))
+        self.max_hamming_distance = max_hamming_distance
+
+    @classmethod
+    def _hash_term(cls, term: Any) -> int:
+        """A stable (unsalted) 64-bit hash of a term"""
+        digest = hashlib.blake2b(str(term).encode("utf-8"), digest_size=cls.SIMHASH_BITS // 8).digest()
+        return int.from_bytes(digest, "big")
+
+    @classmethod
+    def exact_hash(cls, abstract: Abstract) -> str:
+        """A digest of the language model, shared only by abstracts with identical term counts"""
+        items = sorted(abstract.counts.items(), key=lambda item: str(item[0]))
+        serialized = "\n".join("{}\t{}".format(term, count) for term, count in items)
+        return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def similarity_hash(cls, abstract: Abstract) -> int:
+        """A simhash of the language model, with each term as a shingle weighted by its count, such
+        that similar language models produce hashes separated by a small hamming distance"""
+        num_bits = cls.SIMHASH_BITS
+
+        weights = [0] * num_bits
+        for term, count in abstract.counts.items():
+            term_hash = cls._hash_term(term)
+            for bit in range(num_bits):
+                if term_hash >> bit & 1:
+                    weights[bit] += count
+                else:
+                    weights[bit] -= count
+
+        return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+    @classmethod
+    def _bands(cls, simhash: int) -> List[int]:
+        band_width = cls.SIMHASH_BITS // cls.NUM_BANDS
+        mask = (1 << band_width) - 1
+        return [simhash >> (band * band_width) & mask for band in range(cls.NUM_BANDS)]
+
+    def collapse(self, abstracts: List[Abstract]) -> Dict[Abstract, List[Abstract]]:
+        """Map each representative abstract to its duplicates, preserving the order of the provided
+        abstracts; the representative of a group of duplicates is its earliest member"""
+
+        # union-find over the positions of the abstracts, where the root is the earliest member
+        parent = list(range(len(abstracts)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i: int, j: int):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        position_by_exact_hash: Dict[str, int] = {}
+        simhash_by_position: Dict[int, int] = {}
+        positions_by_band: Dict[Any, List[int]] = defaultdict(list)
+
+        for i, abstract in enumerate(abstracts):
+            # abstracts without domain terms are indistinguishable to the scorer, but that does
+            # not make them duplicates of one another
+            if not abstract.counts:
+                continue
+
+            exact_hash = self.exact_hash(abstract)
+            if exact_hash in position_by_exact_hash:
+                union(position_by_exact_hash[exact_hash], i)
+                continue
+            position_by_exact_hash[exact_hash] = i
+
+            simhash = self.similarity_hash(abstract)
+            simhash_by_position[i] = simhash
+
+            # only abstracts that share a band are compared, avoiding a pairwise comparison
+            candidates: Set[int] = set()
+            for band, value in enumerate(self._bands(simhash)):
+                key = (band, value)
+                candidates.update(positions_by_band[key])
+                positions_by_band[key].append(i)
+
+            for j in candidates:
+                if bin(simhash ^ simhash_by_position[j]).count("1") <= self.max_hamming_distance:
+                    union(j, i)
+
+        duplicates_of: Dict[Abstract, List[Abstract]] = {}
+        for i, abstract in enumerate(abstracts):
+            root = find(i)
+            if root == i:
+                duplicates_of[abstract] = []
+            else:
+                duplicates_of[abstracts[root]].append(abstract)
+
+        num_duplicates = len(abstracts) - len(duplicates_of)
+        if num_duplicates:
+            log.info("collapsed %s duplicate abstracts into %s representatives", num_duplicates, len(duplicates_of))
+
+        return duplicates_of
+
+    @staticmethod
+    def expand(cluster: Set[Abstract], duplicates_of: Dict[Abstract, List[Abstract]]) -> Set[Abstract]:
+        """Add the duplicates of each representative in the cluster back to the cluster"""
+        return cluster.union(*(duplicates_of.get(abstract, []) for abstract in cluster))
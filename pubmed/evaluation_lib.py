@@ -0,0 +1,133 @@
+from typing import List, Set, Dict, Tuple
+from collections import Counter
+from dataclasses import dataclass, asdict
+
+import numpy as np
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ClusteringEvaluation:
+    num_pmids: int
+    num_predicted_clusters: int
+    num_expected_clusters: int
+    adjusted_rand_index: float
+    normalized_mutual_information: float
+    homogeneity: float
+    completeness: float
+    v_measure: float
+    purity: float
+    pairwise_precision: float
+    pairwise_recall: float
+    pairwise_f1: float
+
+    def to_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+def build_contingency_matrix(
+    predicted_clusters: List[Set[int]], expected_clusters: List[Set[int]]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Build the sparse contingency matrix of the clusterings, as the rows (predicted clusters),
+    columns (expected clusters) and counts of its nonzero entries, over the PMIDs in both"""
+    expected_cluster_by_pmid = {pmid: j for j, cluster in enumerate(expected_clusters) for pmid in cluster}
+
+    counts = Counter(
+        (i, expected_cluster_by_pmid[pmid])
+        for i, cluster in enumerate(predicted_clusters)
+        for pmid in cluster
+        if pmid in expected_cluster_by_pmid
+    )
+
+    if not counts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    cells, values = zip(*counts.items())
+    rows, columns = zip(*cells)
+    return np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64), np.array(values, dtype=np.int64)
+
+
+def _pairs(x: np.ndarray) -> np.ndarray:
+    """The number of unordered pairs among each of the counts"""
+    return x * (x - 1) / 2
+
+
+def _entropy(sizes: np.ndarray, n: int) -> float:
+    p = sizes[sizes > 0] / n
+    return float(-(p * np.log(p)).sum())
+
+
+def evaluate_clustering(predicted_clusters: List[Set[int]], expected_clusters: List[Set[int]]) -> ClusteringEvaluation:
+    """Compare the predicted clusters to the expected clusters in time linear in the number of
+    PMIDs and nonzero entries of the contingency matrix, rather than in the number of pairs"""
+    rows, columns, n_ij = build_contingency_matrix(predicted_clusters, expected_clusters)
+
+    # renumber the clusters with members in both clusterings
+    _, rows = np.unique(rows, return_inverse=True)
+    _, columns = np.unique(columns, return_inverse=True)
+
+    a = np.bincount(rows, weights=n_ij)
+    b = np.bincount(columns, weights=n_ij)
+    n = int(n_ij.sum())
+
+    if n == 0:
+        raise ValueError("the predicted and expected clusters have no pmids in common")
+
+    # pair counting: pairs placed together in both clusterings, in the predicted clusters, and in
+    # the expected clusters
+    pairs_together = float(_pairs(n_ij).sum())
+    pairs_predicted = float(_pairs(a).sum())
+    pairs_expected = float(_pairs(b).sum())
+    pairs_total = n * (n - 1) / 2
+
+    expected_index = pairs_predicted * pairs_expected / pairs_total if pairs_total else 0.0
+    max_index = (pairs_predicted + pairs_expected) / 2
+    if max_index == expected_index:
+        # e.g., both clusterings are a single cluster, or both are all singletons
+        adjusted_rand_index = 1.0
+    else:
+        adjusted_rand_index = (pairs_together - expected_index) / (max_index - expected_index)
+
+    pairwise_precision = pairs_together / pairs_predicted if pairs_predicted else 1.0
+    pairwise_recall = pairs_together / pairs_expected if pairs_expected else 1.0
+    pairwise_f1 = _harmonic_mean(pairwise_precision, pairwise_recall)
+
+    # information theoretic measures
+    entropy_predicted = _entropy(a, n)
+    entropy_expected = _entropy(b, n)
+    mutual_information = float((n_ij / n * np.log(n * n_ij / (a[rows] * b[columns]))).sum())
+
+    homogeneity = mutual_information / entropy_expected if entropy_expected else 1.0
+    completeness = mutual_information / entropy_predicted if entropy_predicted else 1.0
+    v_measure = _harmonic_mean(homogeneity, completeness)
+
+    mean_entropy = (entropy_predicted + entropy_expected) / 2
+    normalized_mutual_information = mutual_information / mean_entropy if mean_entropy else 1.0
+
+    # the fraction of pmids belonging to the most common expected cluster of their predicted cluster
+    max_by_row = np.zeros(len(a))
+    np.maximum.at(max_by_row, rows, n_ij)
+    purity = float(max_by_row.sum() / n)
+
+    return ClusteringEvaluation(
+        num_pmids=n,
+        num_predicted_clusters=len(a),
+        num_expected_clusters=len(b),
+        adjusted_rand_index=float(adjusted_rand_index),
+        normalized_mutual_information=float(normalized_mutual_information),
+        homogeneity=float(homogeneity),
+        completeness=float(completeness),
+        v_measure=float(v_measure),
+        purity=purity,
+        pairwise_precision=pairwise_precision,
+        pairwise_recall=pairwise_recall,
+        pairwise_f1=pairwise_f1,
+    )
+
+
+def _harmonic_mean(x: float, y: float) -> float:
+    return 2 * x * y / (x + y) if x + y else 0.0
@@ -0,0 +1,81 @@
+from typing import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # without advisory locks (e.g., on Windows), locks only exclude the threads of this process
+    fcntl = None
+
+import logging
+
+log = logging.getLogger(__name__)
+
+# the lock of each path held or awaited by threads of this process, and the number of those threads
+_thread_locks_lock = threading.Lock()
+_thread_locks = {}
+
+
+def write_atomically(path: Path, write: Callable[[Path], None]):
+    """Call `write` with a temporary path beside the specified path, then rename the temporary file
+    to the specified path, such that readers never observe a partially written file"""
+    path = Path(path)
+    temporary_path = path.with_name(
+        ".{name}.{pid}.{thread}.tmp".format(name=path.name, pid=os.getpid(), thread=threading.get_ident())
+    )
+    try:
+        write(temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        if temporary_path.exists():
+            temporary_path.unlink()
+
+
+@contextmanager
+def _thread_lock(path: Path) -> Iterator[None]:
+    with _thread_locks_lock:
+        entry = _thread_locks.setdefault(path, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        # the lock is forgotten once no thread holds or awaits it, so that locking many paths over
+        # the life of a process does not accumulate locks
+        with _thread_locks_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _thread_locks[path]
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on the lock file at the path, waiting for any other process or thread
+    holding it; the lock file is removed on release"""
+    path = Path(path)
+    if fcntl is None:
+        with _thread_lock(path):
+            yield
+        return
+
+    while True:
+        f = path.open("a")
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+        # the holder before us may have removed the lock file, which another process may have since
+        # recreated and locked, so the lock is only ours if the lock file is still the one locked
+        try:
+            if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        f.close()
+
+    try:
+        yield
+    finally:
+        path.unlink()
+        f.close()
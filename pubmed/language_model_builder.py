@@ -1,5 +1,7 @@
-from typing import Set, Optional, Callable
-from collections import Counter
+from typing import Set, Optional, Callable, Tuple, Any
+from collections import Counter, OrderedDict
+import hashlib
+import threading
 
 from pubmed.pubmed_extractor_lib import Abstract
 from pubmed.token_processor_lib import TokenProcessor
@@ -10,15 +12,40 @@ import logging
 log = logging.getLogger(__name__)
 
 
+def hash_term(term: Any, num_buckets: int) -> Tuple[int, int]:
+    """Obtain the bucket and sign of a term using a stable (unsalted) hash, so that models hashed
+    by different processes agree; terms are hashed anew, rather than cached, so that no vocabulary
+    is retained"""
+    digest = hashlib.blake2b(str(term).encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "big")
+
+    # the lowest bit determines the sign, so that colliding terms tend to cancel rather than
+    # accumulate, and the remaining bits determine the bucket
+    sign = 1 if value & 1 else -1
+    return (value >> 1) % num_buckets, sign
+
+
 class LanguageModelBuilder:
-    def __init__(self, filter_words: Set[str], lemmatize: Optional[Callable] = None):
+    def __init__(
+        self,
+        filter_words: Set[str],
+        lemmatize: Optional[Callable] = None,
+        num_buckets: Optional[int] = None,
+        min_token_length: Optional[int] = None,
+    ):
         self.token_processor = TokenProcessor(
             filter_words=filter_words,
             lemmatize=lemmatize,
+            min_token_length=min_token_length,
         )
 
+        if num_buckets is not None and num_buckets < 1:
+            raise ValueError("num_buckets must be positive: {}".format(num_buckets))
+        self.num_buckets = num_buckets
+
     def build_language_model(self, abstract: Abstract) -> Counter:
-        """Build a unigram language model from the text of the specified abstract"""
+        """Build a unigram language model from the text of the specified abstract, keyed by term or,
+        if a number of buckets was specified, by the bucket of each hashed term"""
         text = abstract.fields[abstract.DEFAULT_CATEGORY]
 
         token_processor = self.token_processor
@@ -28,4 +55,58 @@ class LanguageModelBuilder:
             token_counts = token_processor.extract(token)
             counts.update(token_counts)
 
+        if self.num_buckets:
+            counts = self.hash_language_model(counts, self.num_buckets)
+
         return counts
+
+    @staticmethod
+    def hash_language_model(counts: Counter, num_buckets: int) -> Counter:
+        """Map the terms of a language model into a fixed number of buckets, producing a sparse vector
+        that needs no shared vocabulary"""
+        hashed_counts = Counter()
+        for term, count in counts.items():
+            bucket, sign = hash_term(term, num_buckets)
+            hashed_counts[bucket] += sign * count
+
+        # drop buckets in which colliding terms cancelled out, keeping the vector sparse
+        return Counter({bucket: count for bucket, count in hashed_counts.items() if count})
+
+    @staticmethod
+    def merge_language_models(*language_models: Counter) -> Counter:
+        """Sum language models, e.g., those built independently by separate workers; unlike `+`,
+        this keeps the negative values of hashed models"""
+        merged = Counter()
+        for language_model in language_models:
+            merged.update(language_model)
+        return Counter({key: count for key, count in merged.items() if count})
+
+
+class LanguageModelCache:
+    """A thread-safe, least-recently-used cache of language models by PMID, valid only for the
+    language model builder that produced them"""
+
+    DEFAULT_MAX_SIZE = 100000
+
+    def __init__(self, max_size: Optional[int] = DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._counts_by_pmid: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._counts_by_pmid)
+
+    def get(self, pmid: int) -> Optional[Counter]:
+        with self._lock:
+            counts = self._counts_by_pmid.get(pmid)
+            if counts is not None:
+                self._counts_by_pmid.move_to_end(pmid)
+            return counts
+
+    def put(self, pmid: int, counts: Counter):
+        with self._lock:
+            self._counts_by_pmid[pmid] = counts
+            self._counts_by_pmid.move_to_end(pmid)
+            if self.max_size is not None:
+                while len(self._counts_by_pmid) > self.max_size:
+                    self._counts_by_pmid.popitem(last=False)
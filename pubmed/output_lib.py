@@ -0,0 +1,91 @@
+from typing import Set, Dict, Iterable, Optional, TextIO, Type
+from pathlib import Path
+import json
+import sys
+
+from analysis.data_processing_utils import TAB
+
+import logging
+
+log = logging.getLogger(__name__)
+
+# the path of the standard output
+STDOUT = "-"
+
+
+class ClusterWriter:
+    """Write each cluster to a stream as soon as it is complete, flushing after each, such that
+    the clusters of a long run can be consumed while the run continues"""
+
+    def __init__(self, stream: TextIO, close_stream: bool = False):
+        self.stream = stream
+        self.close_stream = close_stream
+        self.num_clusters = 0
+
+    def write_cluster(self, cluster_id: int, pmids: Iterable[int]):
+        self._write_cluster(cluster_id, sorted(pmids))
+        self.stream.flush()
+        self.num_clusters += 1
+
+    def write_clusters(self, clusters: Iterable[Set[int]]) -> int:
+        """Write the clusters, numbered in order, returning the number written"""
+        for cluster_id, cluster in enumerate(clusters, start=self.num_clusters):
+            self.write_cluster(cluster_id, cluster)
+        return self.num_clusters
+
+    def _write_cluster(self, cluster_id: int, pmids: Iterable[int]):
+        raise NotImplementedError
+
+    def close(self):
+        if self.close_stream:
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TsvClusterWriter(ClusterWriter):
+    """A row of cluster id and PMID for each member of each cluster"""
+
+    def _write_cluster(self, cluster_id: int, pmids: Iterable[int]):
+        self.stream.writelines("{}{}{}\n".format(cluster_id, TAB, pmid) for pmid in pmids)
+
+
+class JsonlClusterWriter(ClusterWriter):
+    """A JSON object of cluster id and PMIDs for each cluster"""
+
+    def _write_cluster(self, cluster_id: int, pmids: Iterable[int]):
+        self.stream.write(json.dumps({"cluster_id": cluster_id, "pmids": list(pmids)}) + "\n")
+
+
+class TextClusterWriter(ClusterWriter):
+    """A line of PMIDs for each cluster, as displayed in the terminal but without color"""
+
+    # prefix to easily identify Predicted clusters as opposed to Expected
+    PREFIX = "P"
+
+    def _write_cluster(self, cluster_id: int, pmids: Iterable[int]):
+        name = "{prefix}{group_id}".format(prefix=self.PREFIX, group_id=cluster_id)
+        members = " ".join(str(pmid) for pmid in pmids)
+        self.stream.write("  {name}: {members}\n".format(name=name, members=members))
+
+
+WRITERS: Dict[str, Type[ClusterWriter]] = {
+    "tsv": TsvClusterWriter,
+    "jsonl": JsonlClusterWriter,
+    "text": TextClusterWriter,
+}
+
+
+def open_cluster_writer(output_format: str, path: Optional[str] = None) -> ClusterWriter:
+    """Create a writer of the format to the file at the path or, by default, to the standard output"""
+    if output_format not in WRITERS:
+        raise ValueError("unknown output format: {} (choose from {})".format(output_format, sorted(WRITERS)))
+
+    if path is None or path == STDOUT:
+        return WRITERS[output_format](sys.stdout)
+
+    return WRITERS[output_format](Path(path).open("w"), close_stream=True)
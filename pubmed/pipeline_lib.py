@@ -0,0 +1,193 @@
+from typing import Iterable, Iterator, Callable, Optional, Deque, List, Tuple, TypeVar
+from collections import deque, Counter
+from concurrent.futures import Executor, ThreadPoolExecutor, Future
+import queue
+import threading
+
+from pubmed.abstract_lib import Abstract
+from pubmed.language_model_builder import LanguageModelBuilder, LanguageModelCache
+from pubmed.pubmed_extractor_lib import CachingPubMedProcessor, AbstractProcessingException
+
+import logging
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _StageFailure:
+    """Carries an exception raised by a stage's thread to the consumer of the stage"""
+
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+_END_OF_STAGE = object()
+
+
+def threaded_stage(items: Iterable[T], max_queue_size: int) -> Iterator[T]:
+    """Consume the items in a background thread, buffering at most `max_queue_size` of them
+    until they are requested, such that the producer runs ahead of the consumer"""
+    buffer: queue.Queue = queue.Queue(maxsize=max_queue_size)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        # give up if the consumer has gone away, rather than block on a full buffer forever
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    break
+            else:
+                put(_END_OF_STAGE)
+        except BaseException as exc:
+            put(_StageFailure(exc))
+        finally:
+            close = getattr(items, "close", None)
+            if close:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END_OF_STAGE:
+                return
+            if isinstance(item, _StageFailure):
+                raise item.exception
+            yield item
+    finally:
+        stopped.set()
+
+
+def prefetch_map(
+    function: Callable[[T], R], items: Iterable[T], executor: Executor, max_in_flight: int
+) -> Iterator[R]:
+    """Apply the function to the items concurrently, keeping at most `max_in_flight` calls pending
+    and yielding the results in the order of the items"""
+    in_flight: Deque[Future] = deque()
+    try:
+        for item in items:
+            in_flight.append(executor.submit(function, item))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def iter_unique_pmids(pmids: Iterable[int]) -> Iterator[int]:
+    """Generate each PMID once, in the order of its first occurrence, as each article is clustered once"""
+    seen_pmids = set()
+    repeated_pmids = []
+    for pmid in pmids:
+        if pmid in seen_pmids:
+            repeated_pmids.append(pmid)
+            continue
+        seen_pmids.add(pmid)
+        yield pmid
+
+    if repeated_pmids:
+        log.warning("skipped repeated articles %s", repeated_pmids)
+
+
+class AbstractPipeline:
+    """Chain the stages that turn PMIDs into language models: PMIDs are read lazily, abstracts are
+    looked up in the cache or fetched and parsed by a pool of threads, and language models are
+    built as abstracts arrive, such that network fetches overlap with tokenization and only the
+    language model of each abstract is retained; without a language model builder, the pipeline
+    only retrieves abstracts"""
+
+    DEFAULT_NUM_WORKERS = 8
+    DEFAULT_MAX_QUEUE_SIZE = 64
+
+    def __init__(
+        self,
+        processor: CachingPubMedProcessor,
+        language_model_builder: Optional[LanguageModelBuilder],
+        num_workers: int = DEFAULT_NUM_WORKERS,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        language_model_cache: Optional[LanguageModelCache] = None,
+    ):
+        self.processor = processor
+        self.language_model_builder = language_model_builder
+        self.num_workers = num_workers
+        self.max_queue_size = max_queue_size
+        self.language_model_cache = language_model_cache
+
+    def _get_abstract(self, pmid: int) -> Tuple[int, Optional[Abstract]]:
+        try:
+            return pmid, self.processor.get_abstract(pmid)
+        except AbstractProcessingException as exc:
+            log.warning(exc)
+            return pmid, None
+
+    def _get_language_model_or_abstract(self, pmid: int) -> Tuple[int, Optional[Counter], Optional[Abstract]]:
+        # a cached language model makes the abstract unnecessary
+        if self.language_model_cache is not None:
+            counts = self.language_model_cache.get(pmid)
+            if counts is not None:
+                return pmid, counts, None
+
+        _, abstract = self._get_abstract(pmid)
+        return pmid, None, abstract
+
+    def _fetch_stage(self, function: Callable[[int], T], pmids: Iterable[int]) -> Iterator[T]:
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            yield from prefetch_map(function, pmids, executor=executor, max_in_flight=self.max_queue_size)
+
+    def iter_abstracts(self, pmids: Iterable[int]) -> Iterator[Abstract]:
+        """Generate the abstract of each PMID, in order, skipping articles without an abstract"""
+        missed_pmids: List[int] = []
+
+        fetched = threaded_stage(self._fetch_stage(self._get_abstract, pmids), max_queue_size=self.max_queue_size)
+        for pmid, abstract in fetched:
+            if abstract is None:
+                missed_pmids.append(pmid)
+            else:
+                yield abstract
+
+        if missed_pmids:
+            log.warning("missing articles %s", missed_pmids)
+
+    def iter_language_models(self, pmids: Iterable[int]) -> Iterator[Abstract]:
+        """Generate, for each distinct PMID, an abstract holding only its language model; each
+        article is represented once, so that it is never its own best match"""
+        build_language_model = self.language_model_builder.build_language_model
+        language_model_cache = self.language_model_cache
+
+        missed_pmids: List[int] = []
+
+        fetched = threaded_stage(
+            self._fetch_stage(self._get_language_model_or_abstract, iter_unique_pmids(pmids)),
+            max_queue_size=self.max_queue_size,
+        )
+        for pmid, counts, abstract in fetched:
+            if counts is None:
+                if abstract is None:
+                    missed_pmids.append(pmid)
+                    continue
+
+                counts = build_language_model(abstract)
+                if language_model_cache is not None:
+                    language_model_cache.put(pmid, counts)
+
+            # a new instance, so that the text is not retained and the cached abstract is unchanged
+            yield Abstract.from_counts(pmid, counts)
+
+        if missed_pmids:
+            log.warning("missing articles %s", missed_pmids)
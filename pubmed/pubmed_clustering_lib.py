@@ -1,19 +1,27 @@
-from typing import List, Set, Dict, Tuple, Deque, Optional
+from typing import List, Set, Dict, Tuple, Deque, Optional, Iterable, Iterator, Callable, Any
 from collections import defaultdict, deque
 from functools import partial
+import hashlib
+import time
 
 from nltk.stem import WordNetLemmatizer
 from nltk.corpus import brown as nltk_filter_words
 from pubmed.scorer_lib import SimpleAbstractScorer
 
 from pubmed.abstract_lib import Abstract
-from pubmed.cluster_lib import Cluster
-from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.best_match_lib import BoundedBestMatchSearch
+from pubmed.checkpoint_lib import ClusteringCheckpoint
+from pubmed.cluster_lib import Cluster, Assignment, DeadlineClustering
+from pubmed.document_frequency_lib import DocumentFrequencyFilter
+from pubmed.duplicate_lib import DuplicateDetector
+from pubmed.language_model_builder import LanguageModelBuilder, LanguageModelCache
+from pubmed.pipeline_lib import AbstractPipeline
+from pubmed.pubmed_extractor_lib import CachingPubMedProcessor
 from pubmed.scorer_lib import BaseScorer
 from analysis.data_processing_utils import (
     DatasetDescriptor,
-    get_abstracts,
-    get_pmids_from_unlabeled_file,
+    create_processor,
+    iter_pmids_from_unlabeled_file,
     get_labeled_data,
 )
 
@@ -24,24 +32,184 @@ log = logging.getLogger(__name__)
 
 class PubMedTermBasedClusterer:
     def __init__(
-        self, scorer: Optional[BaseScorer] = None, language_model_builder: Optional[LanguageModelBuilder] = None
+        self,
+        scorer: Optional[BaseScorer] = None,
+        language_model_builder: Optional[LanguageModelBuilder] = None,
+        duplicate_detector: Optional[DuplicateDetector] = None,
+        processor: Optional[CachingPubMedProcessor] = None,
+        language_model_cache: Optional[LanguageModelCache] = None,
+        document_frequency_filter: Optional[DocumentFrequencyFilter] = None,
     ):
         self.scorer = scorer or self._init_default_scorer()
-        self.language_model_builder = language_model_builder or self._init_default_language_model_builder()
+        self.language_model_builder = language_model_builder or self.create_default_language_model_builder()
+        self.duplicate_detector = duplicate_detector
+
+        # created on first use, then kept so that its cache stays loaded
+        self.processor = processor
+
+        # the language models of previously clustered abstracts, if they are to be reused
+        self.language_model_cache = language_model_cache
+
+        # prunes the terms of each corpus by document frequency, if any
+        self.document_frequency_filter = document_frequency_filter
 
     @staticmethod
     def _init_default_scorer() -> BaseScorer:
         return SimpleAbstractScorer()
 
     @staticmethod
-    def _init_default_language_model_builder() -> LanguageModelBuilder:
+    def create_default_language_model_builder(num_buckets: Optional[int] = None) -> LanguageModelBuilder:
         filter_words = set(nltk_filter_words.words())
         lemmatize = WordNetLemmatizer().lemmatize
-        return LanguageModelBuilder(filter_words=filter_words, lemmatize=lemmatize)
+        return LanguageModelBuilder(filter_words=filter_words, lemmatize=lemmatize, num_buckets=num_buckets)
 
-    def _process_assignments(self, abstracts: List[Abstract]) -> Tuple[List[Cluster], Dict[Abstract, Cluster]]:
-        """build the tree of assignments then traverse the tree so that the clusters are inherited
-        by descendants"""
+    @classmethod
+    def cluster_language_models(
+        cls,
+        abstracts: List[Abstract],
+        scorer: Optional[BaseScorer] = None,
+        duplicate_detector: Optional[DuplicateDetector] = None,
+    ) -> List[Set[int]]:
+        """Cluster abstracts holding only their language models, e.g., in a worker process, as sets
+        of PMIDs; the language models are already built, so the clusterer needs no lexicon"""
+        clusterer = cls(
+            scorer=scorer,
+            language_model_builder=LanguageModelBuilder(filter_words=set()),
+            duplicate_detector=duplicate_detector,
+        )
+        return [{abstract.pmid for abstract in cluster} for cluster in clusterer.build_clusters(abstracts)]
+
+    def get_checkpoint_options(self) -> Dict[str, Any]:
+        """Describe the options on which the language models and best matches saved to a checkpoint
+        depend"""
+        token_processor = self.language_model_builder.token_processor
+        document_frequency_filter = self.document_frequency_filter
+
+        lexicon = "\n".join(sorted(token_processor.filter_words)).encode("utf-8")
+
+        return {
+            "scorer": "{}.{}".format(type(self.scorer).__module__, type(self.scorer).__qualname__),
+            "num_buckets": self.language_model_builder.num_buckets,
+            "filter_words": hashlib.blake2b(lexicon, digest_size=16).hexdigest(),
+            "lemmatize": token_processor.lemmatize is not None,
+            "min_token_length": token_processor.min_token_length,
+            "min_document_frequency": (
+                document_frequency_filter.min_document_frequency if document_frequency_filter else None
+            ),
+            "max_document_fraction": (
+                document_frequency_filter.max_document_fraction if document_frequency_filter else None
+            ),
+            "max_hamming_distance": self.duplicate_detector.max_hamming_distance if self.duplicate_detector else None,
+        }
+
+    def _find_best_match(self, abstract: Abstract, abstracts: List[Abstract]) -> Tuple[Abstract, float]:
+        """Find the abstract with the highest similarity score to this abstract, other than itself"""
+        get_score = partial(self.scorer.get_score, target_abstract=abstract)
+
+        return max(
+            ((abstract_i, get_score(model_abstract=abstract_i)) for abstract_i in abstracts if abstract != abstract_i),
+            key=lambda pair: pair[1],
+        )
+
+    def find_best_matches(
+        self, abstracts: List[Abstract], checkpoint: Optional[ClusteringCheckpoint] = None
+    ) -> List[Tuple[Abstract, float]]:
+        """Find the best match, and its score, of each abstract in O(n^2) time, saving the best
+        matches of each block of rows to the checkpoint, if any, and resuming from those saved"""
+        search: Optional[BoundedBestMatchSearch] = None
+        if BoundedBestMatchSearch.is_applicable(abstracts, self.scorer):
+            search = BoundedBestMatchSearch(abstracts, self.scorer)
+
+        def find_best_match(position: int) -> Tuple[Abstract, float]:
+            if search is None:
+                return self._find_best_match(abstracts[position], abstracts)
+            return search.find_best_match(position)
+
+        if checkpoint is None:
+            best_matches = [find_best_match(position) for position in range(len(abstracts))]
+            self._log_search(search)
+            return best_matches
+
+        checkpoint.check_options(self.get_checkpoint_options())
+
+        num_abstracts = len(abstracts)
+        position_by_abstract = {abstract: i for i, abstract in enumerate(abstracts)}
+
+        best_matches: List[Tuple[Abstract, float]] = []
+        for block, start in enumerate(range(0, num_abstracts, checkpoint.block_size)):
+            saved_block = checkpoint.load_best_matches(block, num_abstracts=num_abstracts)
+            if saved_block is not None:
+                best_matches.extend((abstracts[position], score) for position, score in saved_block)
+                continue
+
+            end = min(start + checkpoint.block_size, num_abstracts)
+            block_matches = [find_best_match(position) for position in range(start, end)]
+            checkpoint.save_best_matches(
+                block,
+                num_abstracts=num_abstracts,
+                best_matches=[(position_by_abstract[best_abstract], score) for best_abstract, score in block_matches],
+            )
+            best_matches.extend(block_matches)
+
+        self._log_search(search)
+        return best_matches
+
+    def find_best_matches_before(
+        self, abstracts: List[Abstract], deadline: float
+    ) -> Tuple[List[Tuple[Abstract, float]], int]:
+        """Approximate the best match of each abstract by the other abstract sharing the most weight over
+        only its terms of the highest weight, then replace the approximations with exact best matches, in
+        order, until `deadline`, a time of `time.monotonic`; returns the best matches, and their scores,
+        along with the number of rows refined exactly. Rows not even approximated by the deadline are
+        matched to the first other abstract"""
+        search = BoundedBestMatchSearch(abstracts, self.scorer)
+
+        best_matches = []
+        num_approximated = 0
+        for position in range(len(abstracts)):
+            if time.monotonic() < deadline:
+                best_matches.append(search.find_approximate_best_match(position))
+                num_approximated += 1
+            else:
+                best_matches.append(search.find_first_other_match(position))
+
+        is_bounded = BoundedBestMatchSearch.is_applicable(abstracts, self.scorer)
+
+        num_refined = 0
+        for position, abstract in enumerate(abstracts):
+            if time.monotonic() >= deadline:
+                break
+            if is_bounded:
+                best_matches[position] = search.find_best_match(position)
+            else:
+                best_matches[position] = self._find_best_match(abstract, abstracts)
+            num_refined += 1
+
+        if is_bounded:
+            self._log_search(search)
+        log.info(
+            "approximated %s and refined %s of %s best matches before the deadline",
+            num_approximated,
+            num_refined,
+            len(abstracts),
+        )
+
+        return best_matches, num_refined
+
+    @staticmethod
+    def _log_search(search: Optional[BoundedBestMatchSearch]):
+        if search is not None and search.num_pairs:
+            log.info(
+                "scored %s of %s candidate pairs (%.1f%% pruned)",
+                search.num_scored,
+                search.num_pairs,
+                100 * search.pruned_fraction,
+            )
+
+    def _link_best_matches(
+        self, abstracts: List[Abstract], best_matches: List[Tuple[Abstract, float]]
+    ) -> Tuple[List[Cluster], Dict[Abstract, Cluster], Dict[Abstract, Set[Abstract]], Deque[Abstract]]:
+        """build the tree of assignments, creating a cluster for each root"""
 
         clusters: List[Cluster] = []
         cluster_by_abstract: Dict[Abstract, Cluster] = {}
@@ -50,16 +218,26 @@ class PubMedTermBasedClusterer:
         # an agenda for handling unassigned abstracts
         agenda: Deque[Abstract] = deque()
 
-        for abstract in abstracts:
+        for abstract, (best_abstract, _) in zip(abstracts, best_matches):
             self._build_assignment_tree(
                 abstract=abstract,
-                abstracts=abstracts,
+                best_abstract=best_abstract,
                 clusters=clusters,
                 cluster_by_abstract=cluster_by_abstract,
                 children_of=children_of,
                 agenda=agenda,
             )
 
+        return clusters, cluster_by_abstract, children_of, agenda
+
+    def _process_assignments(
+        self, abstracts: List[Abstract], best_matches: List[Tuple[Abstract, float]]
+    ) -> Tuple[List[Cluster], Dict[Abstract, Cluster]]:
+        """build the tree of assignments then traverse the tree so that the clusters are inherited
+        by descendants"""
+
+        clusters, cluster_by_abstract, children_of, agenda = self._link_best_matches(abstracts, best_matches)
+
         # traverse the tree, assigning children to the cluster of their parent
         self._traverse_assignment_tree(cluster_by_abstract=cluster_by_abstract, children_of=children_of, agenda=agenda)
 
@@ -68,20 +246,12 @@ class PubMedTermBasedClusterer:
     def _build_assignment_tree(
         self,
         abstract: Abstract,
-        abstracts: List[Abstract],
+        best_abstract: Abstract,
         clusters: List[Cluster],
         cluster_by_abstract: Dict[Abstract, Cluster],
         children_of: Dict[Abstract, Set[Abstract]],
         agenda: Deque[Abstract],
     ):
-        get_score = partial(self.scorer.get_score, target_abstract=abstract)
-
-        # find the abstract with the highest similarity score to this abstract
-        best_abstract, best_score = max(
-            ((abstract_i, get_score(model_abstract=abstract_i)) for abstract_i in abstracts if abstract != abstract_i),
-            key=lambda pair: pair[1],
-        )
-
         # were these abstracts already associated?
         if best_abstract in children_of[abstract]:
             # if these abstracts are mutual "best matches", then use the previously
@@ -96,45 +266,75 @@ class PubMedTermBasedClusterer:
             # if not, link them and move on
             children_of[best_abstract].add(abstract)
 
-    def _traverse_assignment_tree(
+    def _iter_assignment_tree(
         self,
         agenda: Deque[Abstract],
         cluster_by_abstract: Dict[Abstract, Cluster],
         children_of: Dict[Abstract, Set[Abstract]],
-    ):
-        """Traverse the tree, assigning children to the cluster of their descendant"""
+    ) -> Iterator[Tuple[Cluster, Set[Abstract]]]:
+        """Traverse the tree, assigning children to the cluster of their descendant, and generate each
+        cluster, with its members, as soon as the tree below its root has been traversed"""
 
         # keep track of abstracts processed to prevent cycles
         abstracts_processed: Set[Abstract] = set()
 
         while agenda:
-            parent_abstract = agenda.popleft()
+            root_abstract = agenda.popleft()
 
-            # have we already seen this abstract?
-            if parent_abstract in abstracts_processed:
-                # if so, skip it
-                log.info("cycle found, skipping: %s", parent_abstract)
-                continue
+            # the tree below each root is traversed completely before the next root's, which assigns
+            # abstracts as a single traversal would, since each abstract has at most one parent
+            root_agenda: Deque[Abstract] = deque([root_abstract])
+            members: Set[Abstract] = set()
+
+            while root_agenda:
+                parent_abstract = root_agenda.popleft()
+
+                # have we already seen this abstract?
+                if parent_abstract in abstracts_processed:
+                    # if so, skip it
+                    log.info("cycle found, skipping: %s", parent_abstract)
+                    continue
 
-            # if not, process it
-            abstracts_processed.add(parent_abstract)
-            cluster = cluster_by_abstract[parent_abstract]
+                # if not, process it
+                abstracts_processed.add(parent_abstract)
+                cluster = cluster_by_abstract[parent_abstract]
+                members.add(parent_abstract)
 
-            # add this node's counts
-            # note: these cluster counts are not currently used
-            cluster.add_counts_from_abstract(parent_abstract)
+                # add this node's counts
+                # note: these cluster counts are not currently used
+                cluster.add_counts_from_abstract(parent_abstract)
 
-            # assign each child to the cluster of its parent, which is
-            # guaranteed to have been assigned to the cluster of its parent
-            for child_abstract in children_of[parent_abstract]:
-                cluster_by_abstract[child_abstract] = cluster
-                agenda.append(child_abstract)
+                # assign each child to the cluster of its parent, which is
+                # guaranteed to have been assigned to the cluster of its parent
+                for child_abstract in children_of[parent_abstract]:
+                    cluster_by_abstract[child_abstract] = cluster
+                    root_agenda.append(child_abstract)
 
-    def assign_best_abstracts(self, abstracts: List[Abstract]) -> Tuple[List[Cluster], Dict[Abstract, Cluster]]:
+            if members:
+                yield cluster_by_abstract[root_abstract], members
+
+    def _traverse_assignment_tree(
+        self,
+        agenda: Deque[Abstract],
+        cluster_by_abstract: Dict[Abstract, Cluster],
+        children_of: Dict[Abstract, Set[Abstract]],
+    ):
+        """Traverse the tree, assigning children to the cluster of their descendant"""
+        for _ in self._iter_assignment_tree(
+            agenda=agenda, cluster_by_abstract=cluster_by_abstract, children_of=children_of
+        ):
+            pass
+
+    def assign_best_abstracts(
+        self, abstracts: List[Abstract], best_matches: Optional[List[Tuple[Abstract, float]]] = None
+    ) -> Tuple[List[Cluster], Dict[Abstract, Cluster]]:
         """Find the optimal cluster assignment for each abstract in O(n^2) time
         where `n` is the number of abstracts"""
 
-        clusters, cluster_by_abstract = self._process_assignments(abstracts)
+        if best_matches is None:
+            best_matches = self.find_best_matches(abstracts)
+
+        clusters, cluster_by_abstract = self._process_assignments(abstracts, best_matches)
 
         for unassigned_abstract in set(abstracts) - set(cluster_by_abstract.keys()):
             log.warning("unassigned: %s", unassigned_abstract.pmid)
@@ -143,7 +343,68 @@ class PubMedTermBasedClusterer:
 
         return clusters, cluster_by_abstract
 
-    def build_clusters(self, abstracts: List[Abstract]) -> List[Set[Abstract]]:
+    def _iter_assign(
+        self,
+        abstracts: List[Abstract],
+        checkpoint: Optional[ClusteringCheckpoint] = None,
+        best_match_by_abstract: Optional[Dict[Abstract, Tuple[Optional[Abstract], float]]] = None,
+        find_best_matches: Optional[Callable[[List[Abstract]], List[Tuple[Abstract, float]]]] = None,
+    ) -> Iterator[Set[Abstract]]:
+        """Assign abstracts to clusters, generating each cluster as soon as it is complete, and
+        recording the best match, and its score, of each abstract in `best_match_by_abstract`;
+        `find_best_matches`, if any, replaces the exhaustive search for the best matches"""
+        if best_match_by_abstract is None:
+            best_match_by_abstract = {}
+
+        duplicates_of: Dict[Abstract, List[Abstract]] = {}
+        if self.duplicate_detector:
+            # only the representatives of any duplicates take part in the pairwise search
+            duplicates_of = self.duplicate_detector.collapse(abstracts)
+            abstracts = list(duplicates_of.keys())
+
+            # a duplicate's best match is its representative
+            for representative, duplicates in duplicates_of.items():
+                for duplicate in duplicates:
+                    score = self.scorer.get_score(target_abstract=duplicate, model_abstract=representative)
+                    best_match_by_abstract[duplicate] = (representative, score)
+
+        def with_duplicates(cluster: Set[Abstract]) -> Set[Abstract]:
+            return DuplicateDetector.expand(cluster, duplicates_of) if duplicates_of else cluster
+
+        if len(abstracts) < 2:
+            # there is no other abstract to serve as a best match
+            best_match_by_abstract.update((abstract, (None, 0)) for abstract in abstracts)
+            if abstracts:
+                yield with_duplicates(set(abstracts))
+            return
+
+        if find_best_matches is None:
+            best_matches = self.find_best_matches(abstracts, checkpoint=checkpoint)
+        else:
+            best_matches = find_best_matches(abstracts)
+        best_match_by_abstract.update(zip(abstracts, best_matches))
+
+        _, cluster_by_abstract, children_of, agenda = self._link_best_matches(abstracts, best_matches)
+
+        for _, members in self._iter_assignment_tree(
+            agenda=agenda, cluster_by_abstract=cluster_by_abstract, children_of=children_of
+        ):
+            yield with_duplicates(members)
+
+        for abstract in abstracts:
+            if abstract not in cluster_by_abstract:
+                log.warning("unassigned: %s", abstract.pmid)
+                yield with_duplicates({abstract})
+
+    def iter_clusters(
+        self, abstracts: List[Abstract], checkpoint: Optional[ClusteringCheckpoint] = None
+    ) -> Iterator[Set[Abstract]]:
+        """Generate the clusters of the abstracts, each as soon as it is complete"""
+        return self._iter_assign(abstracts, checkpoint=checkpoint)
+
+    def build_clusters(
+        self, abstracts: List[Abstract], checkpoint: Optional[ClusteringCheckpoint] = None
+    ) -> List[Set[Abstract]]:
         """Assign abstracts to clusters
 
         If further testing shows that clusters are too fragmented, obtain the variance in
@@ -151,36 +412,164 @@ class PubMedTermBasedClusterer:
         smaller clusters (or perhaps the smaller clusters, themselves) to see if absorbing those
         clusters maintains the previous variance (or diminishes within some threshold)
         """
-        clusters, cluster_by_abstract = self.assign_best_abstracts(abstracts)
+        return list(self._iter_assign(abstracts, checkpoint=checkpoint))
 
-        assignments = defaultdict(set)
-        for abstract, cluster in cluster_by_abstract.items():
-            assignments[cluster].add(abstract)
+    def build_clusters_before(self, abstracts: List[Abstract], deadline: float) -> DeadlineClustering:
+        """Assign abstracts to clusters by best matches that are exact for as many abstracts as the
+        deadline, a time of `time.monotonic`, allows, and approximate for the rest"""
+        clustering = DeadlineClustering(clusters=[], num_rows=0, num_refined=0)
 
-        return list(assignments.values())
+        def find_best_matches(rows: List[Abstract]) -> List[Tuple[Abstract, float]]:
+            best_matches, clustering.num_refined = self.find_best_matches_before(rows, deadline=deadline)
+            clustering.num_rows = len(rows)
+            return best_matches
 
-    def _clusters_to_pmids(self, abstracts: List[Abstract]) -> List[Set[int]]:
-        clusters = self.build_clusters(abstracts)
-        return [{abstract.pmid for abstract in cluster} for cluster in clusters]
+        for cluster in self._iter_assign(abstracts, find_best_matches=find_best_matches):
+            clustering.clusters.append({abstract.pmid for abstract in cluster})
+        return clustering
+
+    def build_assignments(self, abstracts: List[Abstract]) -> List[Assignment]:
+        """Assign abstracts to clusters, describing the cluster and best match of each abstract"""
+        best_match_by_abstract: Dict[Abstract, Tuple[Optional[Abstract], float]] = {}
+        clusters = list(self._iter_assign(abstracts, best_match_by_abstract=best_match_by_abstract))
+
+        cluster_id_by_abstract = {abstract: i for i, cluster in enumerate(clusters) for abstract in cluster}
 
-    def _build_abstracts_from_pmids(self, pmids: List[int]) -> List[Abstract]:
-        """Use the language model builder to generate each abstract's language model"""
-        abstracts = get_abstracts(pmids)
+        assignments = []
         for abstract in abstracts:
-            abstract.counts = self.language_model_builder.build_language_model(abstract)
+            best_abstract, score = best_match_by_abstract[abstract]
+            assignments.append(
+                Assignment(
+                    pmid=abstract.pmid,
+                    cluster_id=cluster_id_by_abstract[abstract],
+                    best_match=best_abstract.pmid if best_abstract else None,
+                    score=score,
+                )
+            )
+        return assignments
+
+    def _clusters_to_pmids(
+        self, abstracts: List[Abstract], checkpoint: Optional[ClusteringCheckpoint] = None
+    ) -> List[Set[int]]:
+        clusters = self.build_clusters(abstracts, checkpoint=checkpoint)
+        return [{abstract.pmid for abstract in cluster} for cluster in clusters]
+
+    def _iter_language_models(self, pmids: Iterable[int]) -> Iterator[Abstract]:
+        """Use the language model builder to generate each abstract's language model, streaming the
+        abstracts through the pipeline and retaining only their language models"""
+        if self.processor is None:
+            self.processor = create_processor()
+
+        pipeline = AbstractPipeline(
+            processor=self.processor,
+            language_model_builder=self.language_model_builder,
+            language_model_cache=self.language_model_cache,
+        )
+        return pipeline.iter_language_models(pmids)
+
+    def build_abstracts_from_pmids(self, pmids: Iterable[int]) -> List[Abstract]:
+        """Build the language model of each abstract then, if a filter was specified, prune the terms
+        of the language models by their document frequency"""
+        abstracts = list(self._iter_language_models(pmids))
+
+        if self.document_frequency_filter:
+            self.document_frequency_filter.prune(abstracts)
+
+        return abstracts
+
+    def prefetch(self, pmids: Iterable[int]) -> int:
+        """Build and cache the language models of the specified articles, returning the number of
+        articles with an abstract"""
+        if self.language_model_cache is None:
+            raise ValueError("prefetching requires a language model cache")
+        return sum(1 for _ in self._iter_language_models(pmids))
+
+    def _build_abstracts_with_checkpoint(
+        self, pmids: List[int], checkpoint: Optional[ClusteringCheckpoint]
+    ) -> List[Abstract]:
+        """Build the language models of the articles or, if resuming, load those of the checkpoint"""
+        if checkpoint is None:
+            return self.build_abstracts_from_pmids(pmids=pmids)
+
+        checkpoint.check_pmids(pmids)
+        checkpoint.check_options(self.get_checkpoint_options())
+
+        abstracts = checkpoint.load_language_models()
+        if abstracts is None:
+            abstracts = self.build_abstracts_from_pmids(pmids=pmids)
+            checkpoint.save_language_models(abstracts)
+
+        return abstracts
+
+    def iter_clusters_from_pmids(
+        self, pmids: Iterable[int], checkpoint: Optional[ClusteringCheckpoint] = None
+    ) -> Iterator[Set[int]]:
+        """Cluster the specified articles given their abstracts, generating each cluster as soon as
+        it is complete"""
+        if checkpoint is None:
+            abstracts = self.build_abstracts_from_pmids(pmids=pmids)
+        else:
+            abstracts = self._build_abstracts_with_checkpoint(pmids=list(pmids), checkpoint=checkpoint)
+
+        for cluster in self.iter_clusters(abstracts, checkpoint=checkpoint):
+            yield {abstract.pmid for abstract in cluster}
+
+    def predict_clusters_from_pmids(
+        self, pmids: Iterable[int], checkpoint: Optional[ClusteringCheckpoint] = None
+    ) -> List[Set[int]]:
+        """Cluster the specified articles given their abstracts"""
+        return list(self.iter_clusters_from_pmids(pmids=pmids, checkpoint=checkpoint))
+
+    def build_abstracts_from_pmids_before(self, pmids: Iterable[int], deadline: float) -> List[Abstract]:
+        """Build the language models of the articles retrieved before the deadline, a time of
+        `time.monotonic`, leaving out the rest, then prune them as `build_abstracts_from_pmids` does"""
+        pmids = list(pmids)
+
+        abstracts = []
+        language_models = self._iter_language_models(pmids)
+        try:
+            for abstract in language_models:
+                if time.monotonic() >= deadline:
+                    # the fetches in progress complete in the background, and are cached
+                    log.warning(
+                        "stopped retrieving abstracts at the deadline, after %s of %s articles",
+                        len(abstracts),
+                        len(set(pmids)),
+                    )
+                    break
+                abstracts.append(abstract)
+        finally:
+            language_models.close()
+
+        if self.document_frequency_filter:
+            self.document_frequency_filter.prune(abstracts)
+
         return abstracts
 
-    def predict_clusters(self, dataset: DatasetDescriptor) -> List[Set[int]]:
+    def predict_clusters_from_pmids_before(self, pmids: Iterable[int], deadline: float) -> DeadlineClustering:
+        """Cluster the articles whose abstracts are retrieved before the deadline, refining the clusters
+        until the deadline"""
+        abstracts = self.build_abstracts_from_pmids_before(pmids=pmids, deadline=deadline)
+        return self.build_clusters_before(abstracts, deadline=deadline)
+
+    def predict_clusters_before(self, dataset: DatasetDescriptor, deadline: float) -> DeadlineClustering:
+        """Cluster the provided articles whose abstracts are retrieved before the deadline, refining the
+        clusters until the deadline"""
+        return self.predict_clusters_from_pmids_before(pmids=iter_pmids_from_unlabeled_file(dataset), deadline=deadline)
+
+    def predict_clusters(
+        self, dataset: DatasetDescriptor, checkpoint: Optional[ClusteringCheckpoint] = None
+    ) -> List[Set[int]]:
         """Cluster the provided articles given their abstracts"""
-        return self._clusters_to_pmids(
-            abstracts=self._build_abstracts_from_pmids(pmids=get_pmids_from_unlabeled_file(dataset))
-        )
+        return self.predict_clusters_from_pmids(pmids=iter_pmids_from_unlabeled_file(dataset), checkpoint=checkpoint)
 
-    def predict_clusters_and_evaluate(self, dataset: DatasetDescriptor) -> Tuple[List[Set[int]], List[Set[int]]]:
+    def predict_clusters_and_evaluate(
+        self, dataset: DatasetDescriptor, checkpoint: Optional[ClusteringCheckpoint] = None
+    ) -> Tuple[List[Set[int]], List[Set[int]]]:
         """Cluster the provided articles given their abstracts and display them in the context
         of their intended groupings, with respect to the labels"""
         pmids, expected_assignments = get_labeled_data(dataset)
 
-        predicted_assignments = self._clusters_to_pmids(abstracts=self._build_abstracts_from_pmids(pmids=pmids))
+        predicted_assignments = self.predict_clusters_from_pmids(pmids=pmids, checkpoint=checkpoint)
 
         return predicted_assignments, expected_assignments
@@ -3,11 +3,17 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Optional, DefaultDict
 from collections import defaultdict
+from dataclasses import dataclass, asdict
+import json
+import os
+import threading
+import time
 
 import requests
 from bs4 import BeautifulSoup
 
 from pubmed.abstract_lib import Abstract
+from pubmed.file_lib import file_lock, write_atomically
 
 import logging
 
@@ -18,14 +24,55 @@ class AbstractProcessingException(ValueError):
     pass
 
 
+@dataclass
+class NegativeCacheEntry:
+    """A record of an article without an abstract, or whose retrieval failed permanently"""
+
+    reason: str
+    timestamp: float
+
+
 class CachingPubMedProcessor:
     DEFAULT_CACHE_DIR = "abstract_cache"
 
-    def __init__(self, cache_dir: Optional[str]):
+    # a journal of json records, one per line, each recording or removing the miss of an article
+    NEGATIVE_CACHE_FILENAME = "negative_cache.jsonl"
+
+    _NEGATIVE_CACHE_KEY_PMID = "pmid"
+    _NEGATIVE_CACHE_KEY_REMOVED = "removed"
+
+    # the journal is compacted once it holds at least this many records, and twice as many as entries
+    NEGATIVE_CACHE_MIN_RECORDS_TO_COMPACT = 1000
+
+    # the subdirectory to which unreadable cache entries are moved
+    QUARANTINE_DIRNAME = "quarantine"
+
+    LOCK_SUFFIX = "lock"
+
+    # the number of seconds after which a negative entry expires and the article is retried
+    DEFAULT_NEGATIVE_TTL = 30 * 24 * 60 * 60
+
+    # http status codes indicating that retrying the retrieval of an article is futile
+    PERMANENT_FAILURE_STATUS_CODES = {404, 410}
+
+    def __init__(
+        self, cache_dir: Optional[str], negative_ttl: Optional[float] = DEFAULT_NEGATIVE_TTL, refresh: bool = False
+    ):
+        """A `negative_ttl` of None keeps negative entries indefinitely, and `refresh` ignores
+        negative entries, retrying every article not in the cache"""
         self.cache_dir = self._setup_cache_dir(cache_dir)
         self.processor = PubMedProcessor()
         self.cache = self._load_cache()
 
+        self.negative_ttl = negative_ttl
+        self.refresh = refresh
+        self._negative_cache_lock = threading.Lock()
+        self.negative_cache: Dict[int, NegativeCacheEntry] = {}
+        self._negative_cache_inode: Optional[int] = None
+        self._negative_cache_offset = 0
+        self._num_negative_cache_records = 0
+        self._read_negative_cache()
+
     def _setup_cache_dir(self, cache_dir: Optional[str]) -> str:
         """setup, if necessary, the directory to be used for cached abstracts"""
         if cache_dir is None:
@@ -34,30 +81,205 @@ class CachingPubMedProcessor:
         Path(cache_dir).mkdir(parents=True, exist_ok=True)
         return cache_dir
 
+    def _get_abstract_path(self, pmid: int) -> Path:
+        return Path(self.cache_dir, "{pmid}.{suffix}".format(pmid=pmid, suffix=Abstract.SUFFIX))
+
+    def _get_lock_path(self, name: str) -> Path:
+        return Path(self.cache_dir, ".{name}.{suffix}".format(name=name, suffix=self.LOCK_SUFFIX))
+
+    def _quarantine(self, path: Path, reason: str):
+        """move an unreadable cache entry aside, so that it is neither loaded nor trusted again"""
+        log.warning("quarantining %s: %s", path, reason)
+        quarantine_dir = Path(self.cache_dir, self.QUARANTINE_DIRNAME)
+        quarantine_dir.mkdir(exist_ok=True)
+        try:
+            os.replace(path, Path(quarantine_dir, path.name))
+        except FileNotFoundError:
+            # another process quarantined it first
+            pass
+
+    def _load_cached_abstract(self, path: Path) -> Optional[Abstract]:
+        """load an abstract from the cache directory, quarantining it if it is corrupt or partial"""
+        try:
+            abstract = Abstract.load(str(path))
+        except (OSError, KeyError, ValueError, AssertionError) as exc:
+            self._quarantine(path, reason=str(exc) or type(exc).__name__)
+            return None
+
+        if str(abstract.pmid) != path.stem:
+            self._quarantine(path, reason="holds article {}".format(abstract.pmid))
+            return None
+
+        return abstract
+
     def _load_cache(self) -> Dict[int, Abstract]:
         """load abstracts from the specified  directory"""
         # a generator containing all files ending in the Abstract's suffix
-        path_gen = (str(s) for s in Path(self.cache_dir).iterdir() if s.suffix[1:] == Abstract.SUFFIX)
+        path_gen = (s for s in Path(self.cache_dir).iterdir() if s.suffix[1:] == Abstract.SUFFIX)
 
-        # generate abstracts from the paths
-        abstract_gen = (Abstract.load(path) for path in path_gen)
+        # generate abstracts from the paths, skipping those quarantined
+        abstract_gen = (abstract for abstract in map(self._load_cached_abstract, path_gen) if abstract)
 
         # consume the chained generators into a dictionary
         return {abstract.pmid: abstract for abstract in abstract_gen}
 
+    @property
+    def _negative_cache_path(self) -> Path:
+        return Path(self.cache_dir, self.NEGATIVE_CACHE_FILENAME)
+
+    def _read_negative_cache(self):
+        """apply the records appended to the journal of the negative cache since it was last read,
+        reading it anew if it was compacted by any process sharing the cache directory"""
+        path = self._negative_cache_path
+        try:
+            with path.open("rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self._negative_cache_inode or stat.st_size < self._negative_cache_offset:
+                    self.negative_cache = {}
+                    self._negative_cache_offset = 0
+                    self._num_negative_cache_records = 0
+                    self._negative_cache_inode = stat.st_ino
+
+                f.seek(self._negative_cache_offset)
+                data = f.read()
+        except OSError as exc:
+            if not isinstance(exc, FileNotFoundError):
+                # an unreadable journal is set aside, and the articles it recorded are retried
+                self._quarantine(path, reason=str(exc) or type(exc).__name__)
+            self.negative_cache = {}
+            self._negative_cache_offset = 0
+            self._num_negative_cache_records = 0
+            self._negative_cache_inode = None
+            return
+
+        # a line not yet terminated is still being written, and is read once complete
+        end = data.rfind(b"\n") + 1
+        self._negative_cache_offset += end
+
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+                pmid = int(record.pop(self._NEGATIVE_CACHE_KEY_PMID))
+                if record.pop(self._NEGATIVE_CACHE_KEY_REMOVED, False):
+                    self.negative_cache.pop(pmid, None)
+                else:
+                    self.negative_cache[pmid] = NegativeCacheEntry(**record)
+            except (ValueError, TypeError, KeyError, AttributeError) as exc:
+                # such as a line left incomplete by an interrupted process
+                log.warning("skipping a corrupt record of %s: %s", path, exc)
+            self._num_negative_cache_records += 1
+
+    def _compact_negative_cache(self):
+        """rewrite the journal of the negative cache with one record per entry"""
+        lines = [
+            json.dumps(dict(asdict(entry), **{self._NEGATIVE_CACHE_KEY_PMID: pmid}), sort_keys=True) + "\n"
+            for pmid, entry in self.negative_cache.items()
+        ]
+
+        def write(temporary_path: Path):
+            with temporary_path.open("w") as f:
+                f.writelines(lines)
+
+        write_atomically(self._negative_cache_path, write)
+
+        # the compacted journal is read anew, as by any other process
+        self._read_negative_cache()
+
+    def _append_to_negative_cache(self, record: dict):
+        """append a record to the journal of the negative cache shared by the processes using the
+        cache directory, such that recording a miss costs the same however many are recorded"""
+        with self._negative_cache_lock, file_lock(self._get_lock_path(self.NEGATIVE_CACHE_FILENAME)):
+            with self._negative_cache_path.open("a+b") as f:
+                # the line of an interrupted writer is terminated, rather than extended
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write(json.dumps(record, sort_keys=True).encode() + b"\n")
+
+            self._read_negative_cache()
+
+            # records superseded by later records are dropped once they outnumber the entries
+            num_records = self._num_negative_cache_records
+            if num_records > self.NEGATIVE_CACHE_MIN_RECORDS_TO_COMPACT and num_records > 2 * len(self.negative_cache):
+                self._compact_negative_cache()
+
+    def _add_to_negative_cache(self, pmid: int, reason: str):
+        log.info("caching miss %s: %s", pmid, reason)
+        entry = NegativeCacheEntry(reason=reason, timestamp=time.time())
+        self._append_to_negative_cache(dict(asdict(entry), **{self._NEGATIVE_CACHE_KEY_PMID: pmid}))
+
+    def _remove_from_negative_cache(self, pmid: int):
+        if pmid not in self.negative_cache:
+            return
+
+        self._append_to_negative_cache({self._NEGATIVE_CACHE_KEY_PMID: pmid, self._NEGATIVE_CACHE_KEY_REMOVED: True})
+
+    def get_miss(self, pmid: int) -> Optional[NegativeCacheEntry]:
+        """get the unexpired negative entry of the specified pmid, if any"""
+        if self.refresh:
+            return None
+
+        entry = self.negative_cache.get(pmid)
+        if entry is None:
+            return None
+
+        if self.negative_ttl is not None and time.time() - entry.timestamp >= self.negative_ttl:
+            return None
+
+        return entry
+
     def _add_to_cache(self, pmid: int):
-        """add the abstract of the specified article to the cache"""
+        """add the abstract of the specified article to the cache, or record its absence"""
         log.info("caching %s", pmid)
-        abstract = self.processor.get_abstract(pmid)
+        try:
+            abstract = self.processor.get_abstract(pmid)
+        except AbstractProcessingException as exc:
+            self._add_to_negative_cache(pmid, reason=str(exc))
+            raise
+        except requests.HTTPError as exc:
+            if exc.response is None or exc.response.status_code not in self.PERMANENT_FAILURE_STATUS_CODES:
+                raise
+            self._add_to_negative_cache(pmid, reason=str(exc))
+            raise AbstractProcessingException("article {} not retrievable: {}".format(pmid, exc)) from exc
+
         abstract.save(directory=self.cache_dir)
         self.cache[pmid] = abstract
+        self._remove_from_negative_cache(pmid)
 
     def get_abstract(self, pmid: int) -> Abstract:
         """get the abstract of the specified pmid"""
         if pmid not in self.cache:
-            self._add_to_cache(pmid)
+            miss = self.get_miss(pmid)
+            if miss:
+                raise AbstractProcessingException("cached miss for article {}: {}".format(pmid, miss.reason))
+
+            # only one process, or thread, retrieves an article, while the others wait to reuse it
+            with file_lock(self._get_lock_path(str(pmid))):
+                self._reuse_or_add_to_cache(pmid)
+
         return self.cache[pmid]
 
+    def _reuse_or_add_to_cache(self, pmid: int):
+        """add the abstract of the specified article to the cache, unless another process, or thread,
+        cached it, or recorded its absence, while this one waited for the article's lock"""
+        if pmid in self.cache:
+            return
+
+        path = self._get_abstract_path(pmid)
+        abstract = self._load_cached_abstract(path) if path.exists() else None
+        if abstract is not None:
+            self.cache[pmid] = abstract
+            return
+
+        with self._negative_cache_lock:
+            self._read_negative_cache()
+        miss = self.get_miss(pmid)
+        if miss:
+            raise AbstractProcessingException("cached miss for article {}: {}".format(pmid, miss.reason))
+
+        self._add_to_cache(pmid)
+
 
 class PubMedProcessor:
     XML_KEY_ABSTRACT = "abstract"
@@ -6,11 +6,17 @@ log = logging.getLogger(__name__)
 
 
 class BaseScorer:
+    # whether the score is the dot product of the counts of the language models, which permits
+    # bounding the scores of best matches
+    IS_DOT_PRODUCT = False
+
     def get_score(self, target_abstract: Abstract, model_abstract: Abstract) -> float:
         raise NotImplementedError()
 
 
 class SimpleAbstractScorer(BaseScorer):
+    IS_DOT_PRODUCT = True
+
     def get_score(self, target_abstract: Abstract, model_abstract: Abstract) -> float:
         """Obtain the similarity score for the specified abstracts, setup as a strategy-pattern
         for easy experimentation with other scoring approaches"""
@@ -28,3 +34,9 @@ class SimpleAbstractScorer(BaseScorer):
         model_counts = model_abstract.counts
 
         return sum(target_count * model_counts.get(term, 0) for term, target_count in target_counts.items())
+
+
+# scorers by name, e.g., for selection from the command line
+SCORERS = {
+    "simple": SimpleAbstractScorer,
+}
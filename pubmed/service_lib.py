@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+from typing import List, Dict, Any, Optional, Deque
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import copy
+import json
+import socketserver
+import threading
+import time
+
+from pubmed.abstract_lib import Abstract
+from pubmed.duplicate_lib import DuplicateDetector
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from analysis.data_processing_utils import create_processor
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ClusteringJob:
+    pmids: List[int]
+    collapse_duplicates: bool = False
+
+    @classmethod
+    def from_json(cls, payload: Dict[str, Any]) -> ClusteringJob:
+        """Create a job from a request body such as {"pmids": [...], "options": {...}}"""
+        pmids = payload.get("pmids")
+        if not isinstance(pmids, list) or not pmids:
+            raise ValueError("a non-empty list of pmids is required")
+
+        options = payload.get("options") or {}
+        unknown_options = set(options) - {"collapse_duplicates"}
+        if unknown_options:
+            raise ValueError("unknown options: {}".format(sorted(unknown_options)))
+
+        return ClusteringJob(
+            pmids=[int(pmid) for pmid in pmids],
+            collapse_duplicates=bool(options.get("collapse_duplicates", False)),
+        )
+
+
+@dataclass
+class ServiceMetrics:
+    """Counts of jobs and their recent latencies, in seconds"""
+
+    MAX_LATENCIES = 1000
+
+    submitted: int = 0
+    started: int = 0
+    completed: int = 0
+    failed: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=ServiceMetrics.MAX_LATENCIES))
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            finished = self.completed + self.failed
+            return {
+                "jobs_submitted": self.submitted,
+                "jobs_completed": self.completed,
+                "jobs_failed": self.failed,
+                "jobs_queued": self.submitted - self.started,
+                "jobs_running": self.started - finished,
+                "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+                "latency_p50": self._percentile(latencies, 0.50),
+                "latency_p95": self._percentile(latencies, 0.95),
+                "latency_max": latencies[-1] if latencies else None,
+            }
+
+    @staticmethod
+    def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+        if not sorted_values:
+            return None
+        return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class ClusteringService:
+    """Cluster jobs with a clusterer whose lexicon, processor and caches are kept warm between jobs,
+    running at most `num_workers` jobs at a time"""
+
+    DEFAULT_NUM_WORKERS = 4
+
+    WARMING_TEXT = "warming studies"
+
+    def __init__(self, clusterer: PubMedTermBasedClusterer, num_workers: int = DEFAULT_NUM_WORKERS):
+        if clusterer.processor is None:
+            clusterer.processor = create_processor()
+
+        self.clusterer = clusterer
+        self.executor = ThreadPoolExecutor(max_workers=num_workers)
+        self.metrics = ServiceMetrics()
+
+        # a clusterer sharing the same state, but collapsing duplicates before clustering
+        self.deduplicating_clusterer = copy.copy(clusterer)
+        self.deduplicating_clusterer.duplicate_detector = clusterer.duplicate_detector or DuplicateDetector()
+
+    def warm(self):
+        """Load the lemmatizer's corpus before the first job arrives; the lexicon and the abstract
+        cache are loaded with the clusterer"""
+        start = time.time()
+        clusterer = self.clusterer
+
+        # nltk loads the corpus of the lemmatizer on its first use
+        clusterer.language_model_builder.build_language_model(Abstract(pmid=0, text=self.WARMING_TEXT))
+
+        log.info(
+            "warmed up in %.2fs with %s cached abstracts", time.time() - start, len(clusterer.processor.cache)
+        )
+
+    def _run(self, job: ClusteringJob) -> Dict[str, Any]:
+        metrics = self.metrics
+        with metrics.lock:
+            metrics.started += 1
+
+        start = time.time()
+        try:
+            clusterer = self.deduplicating_clusterer if job.collapse_duplicates else self.clusterer
+            clusters = clusterer.predict_clusters_from_pmids(job.pmids)
+        except Exception:
+            with metrics.lock:
+                metrics.failed += 1
+            raise
+
+        latency = time.time() - start
+        with metrics.lock:
+            metrics.completed += 1
+            metrics.latencies.append(latency)
+
+        clustered_pmids = set().union(*clusters)
+        return {
+            "clusters": [sorted(cluster) for cluster in clusters],
+            "missing": sorted(set(job.pmids) - clustered_pmids),
+            "latency": latency,
+        }
+
+    def submit(self, job: ClusteringJob) -> Future:
+        with self.metrics.lock:
+            self.metrics.submitted += 1
+        return self.executor.submit(self._run, job)
+
+    def create_server(
+        self, host: Optional[str] = None, port: Optional[int] = None, socket_path: Optional[str] = None
+    ) -> socketserver.BaseServer:
+        """Create an HTTP server on either a TCP port or a Unix socket"""
+        handler = type("BoundClusteringRequestHandler", (ClusteringRequestHandler,), {"service": self})
+
+        if socket_path:
+            Path(socket_path).unlink(missing_ok=True)
+            return ThreadingUnixHTTPServer(socket_path, handler)
+
+        return ThreadingHTTPServer((host, port), handler)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ClusteringRequestHandler(BaseHTTPRequestHandler):
+    """Serves `POST /cluster` for clustering jobs, and `GET /metrics` and `GET /health`"""
+
+    service: ClusteringService
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(200, self.service.metrics.snapshot())
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "not found: {}".format(self.path)})
+
+    def do_POST(self):
+        try:
+            # the body is read even if it is not used, as the client may still be sending it
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        except ValueError as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+
+        if self.path != "/cluster":
+            self._send_json(404, {"error": "not found: {}".format(self.path)})
+            return
+
+        try:
+            job = ClusteringJob.from_json(json.loads(body or b"{}"))
+        except (ValueError, TypeError, AttributeError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+
+        try:
+            result = self.service.submit(job).result()
+        except Exception as exc:
+            log.exception("job failed")
+            self._send_json(500, {"error": str(exc)})
+            return
+
+        self._send_json(200, result)
+
+    def address_string(self) -> str:
+        # clients of a Unix socket have no address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format: str, *args):
+        log.info("%s - %s", self.address_string(), format % args)
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+from typing import List, Dict, Tuple, Set, Any, Optional, Iterable
+from collections import Counter
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from pubmed.abstract_lib import Abstract
+from pubmed.columnar_lib import create_column, save_vocabulary, load_vocabulary
+from pubmed.file_lib import write_atomically
+from pubmed.scorer_lib import SimpleAbstractScorer
+
+import logging
+
+log = logging.getLogger(__name__)
+
+GROUP_INDEX = "index"
+
+ATTR_NUM_BUCKETS = "num_buckets"
+
+
+class SimilarityIndex:
+    """An inverted index of language models, listing for each term the abstracts in which it occurs
+    and its count in each, such that the abstracts most similar to a query, by the dot product of
+    `SimpleAbstractScorer`, are found by scoring only the abstracts sharing a term with the query.
+
+    Abstracts added to the index are scored directly until enough accumulate to rebuild the
+    postings, which happens at the latest when the index is saved"""
+
+    DEFAULT_K = 10
+
+    MAX_PENDING = 1000
+
+    def __init__(self, num_buckets: Optional[int] = None):
+        # the number of buckets into which the terms of the language models were hashed, if any,
+        # which the language models of queries must share
+        self.num_buckets = num_buckets
+
+        self.terms: List[Any] = []
+        self.term_ids: Dict[Any, int] = {}
+
+        # the language model of each document, as rows of term ids and counts by document
+        self.pmids = np.zeros(0, dtype=np.int64)
+        self.document_offsets = np.zeros(1, dtype=np.int64)
+        self.document_term_ids = np.zeros(0, dtype=np.int64)
+        self.document_counts = np.zeros(0, dtype=np.int64)
+
+        # the postings of each term, as rows of documents and counts by term
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.posting_document_ids = np.zeros(0, dtype=np.int64)
+        self.posting_counts = np.zeros(0, dtype=np.int64)
+
+        self.document_id_by_pmid: Dict[int, int] = {}
+
+        # documents superseded by a later version of their abstract
+        self.replaced: Set[int] = set()
+
+        # abstracts added since the postings were last built
+        self.pending: Dict[int, Abstract] = {}
+
+    def __len__(self) -> int:
+        # the documents replaced are those of abstracts pending
+        return len(self.pmids) - len(self.replaced) + len(self.pending)
+
+    def __contains__(self, pmid: int) -> bool:
+        return pmid in self.pending or pmid in self.document_id_by_pmid
+
+    def add(self, abstracts: Iterable[Abstract]):
+        """Add the language models of the abstracts, replacing those of any already indexed"""
+        for abstract in abstracts:
+            document_id = self.document_id_by_pmid.get(abstract.pmid)
+            if document_id is not None:
+                self.replaced.add(document_id)
+
+            self.pending[abstract.pmid] = Abstract.from_counts(abstract.pmid, Counter(abstract.counts))
+
+        if len(self.pending) >= self.MAX_PENDING:
+            self.build()
+
+    def build(self):
+        """Rebuild the postings from the indexed documents and those added since"""
+        if not self.pending and not self.replaced:
+            return
+
+        kept = np.ones(len(self.pmids), dtype=bool)
+        kept[list(self.replaced)] = False
+        lengths = np.diff(self.document_offsets)
+        kept_rows = np.repeat(kept, lengths)
+
+        pmids = [self.pmids[kept]]
+        document_lengths = [lengths[kept]]
+        document_term_ids = [self.document_term_ids[kept_rows]]
+        document_counts = [self.document_counts[kept_rows]]
+
+        for pmid, abstract in self.pending.items():
+            pmids.append(np.array([pmid], dtype=np.int64))
+            document_lengths.append(np.array([len(abstract.counts)], dtype=np.int64))
+            document_term_ids.append(
+                np.array([self._get_or_add_term_id(term) for term in abstract.counts], dtype=np.int64)
+            )
+            document_counts.append(np.array(list(abstract.counts.values()), dtype=np.int64))
+
+        self.pmids = np.concatenate(pmids)
+        self.document_offsets = np.concatenate([[0], np.cumsum(np.concatenate(document_lengths))]).astype(np.int64)
+        self.document_term_ids = np.concatenate(document_term_ids)
+        self.document_counts = np.concatenate(document_counts)
+
+        self.replaced = set()
+        self.pending = {}
+
+        self._build_postings()
+        log.info("indexed %s abstracts with %s terms", len(self.pmids), len(self.terms))
+
+    def _get_or_add_term_id(self, term: Any) -> int:
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def _build_postings(self):
+        num_documents = len(self.pmids)
+        self.document_id_by_pmid = dict(zip(self.pmids.tolist(), range(num_documents)))
+
+        # a stable sort keeps the postings of each term in the order of the documents
+        order = np.argsort(self.document_term_ids, kind="stable")
+        document_ids = np.repeat(np.arange(num_documents, dtype=np.int64), np.diff(self.document_offsets))
+        self.posting_document_ids = document_ids[order]
+        self.posting_counts = self.document_counts[order]
+
+        self.term_offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.document_term_ids, minlength=len(self.terms)), out=self.term_offsets[1:])
+
+    def get_counts(self, pmid: int) -> Counter:
+        """Obtain the indexed language model of an abstract"""
+        if pmid in self.pending:
+            return Counter(self.pending[pmid].counts)
+
+        document_id = self.document_id_by_pmid[pmid]
+        start, end = self.document_offsets[document_id], self.document_offsets[document_id + 1]
+        return Counter(
+            dict(
+                zip(
+                    (self.terms[term_id] for term_id in self.document_term_ids[start:end].tolist()),
+                    self.document_counts[start:end].tolist(),
+                )
+            )
+        )
+
+    def query(self, counts: Counter, k: int = DEFAULT_K, exclude_pmid: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Find the (at most) k abstracts most similar to a language model, as PMIDs and scores in
+        descending order of score and then in the order in which they were indexed; only abstracts
+        with a positive score are similar"""
+        if k < 1:
+            raise ValueError("k must be positive: {}".format(k))
+
+        pmids: List[np.ndarray] = []
+        scores: List[np.ndarray] = []
+
+        # accumulate the score of each document over the postings of the query's terms
+        posting_document_ids = []
+        posting_products = []
+        for term, count in counts.items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            posting_document_ids.append(self.posting_document_ids[start:end])
+            posting_products.append(self.posting_counts[start:end] * count)
+
+        if posting_document_ids:
+            document_ids, positions = np.unique(np.concatenate(posting_document_ids), return_inverse=True)
+            document_scores = np.zeros(len(document_ids), dtype=np.int64)
+            np.add.at(document_scores, positions, np.concatenate(posting_products))
+
+            document_pmids = self.pmids[document_ids]
+            matched = document_scores > 0
+            if self.replaced:
+                matched &= ~np.isin(document_ids, list(self.replaced))
+            if exclude_pmid is not None:
+                matched &= document_pmids != exclude_pmid
+
+            pmids.append(document_pmids[matched])
+            scores.append(document_scores[matched])
+
+        # abstracts added since the postings were built are few, and are scored directly
+        if self.pending:
+            query_abstract = Abstract.from_counts(-1, counts)
+            pending_scores = [
+                (pmid, SimpleAbstractScorer.dot_product_score(target_abstract=query_abstract, model_abstract=abstract))
+                for pmid, abstract in self.pending.items()
+                if pmid != exclude_pmid
+            ]
+            pending_scores = [(pmid, score) for pmid, score in pending_scores if score > 0]
+            if pending_scores:
+                pending_pmids, pending_document_scores = zip(*pending_scores)
+                pmids.append(np.array(pending_pmids, dtype=np.int64))
+                scores.append(np.array(pending_document_scores, dtype=np.int64))
+
+        if not pmids:
+            return []
+
+        pmids_array = np.concatenate(pmids)
+        scores_array = np.concatenate(scores)
+
+        # only the candidates scoring at least the kth best score need be sorted
+        if len(scores_array) > k:
+            kth_score = np.partition(scores_array, len(scores_array) - k)[len(scores_array) - k]
+            candidates = scores_array >= kth_score
+            pmids_array, scores_array = pmids_array[candidates], scores_array[candidates]
+
+        # candidates are already in the order in which they were indexed, which breaks ties
+        order = np.argsort(-scores_array, kind="stable")[:k]
+        return list(zip(pmids_array[order].tolist(), scores_array[order].tolist()))
+
+    def query_pmid(self, pmid: int, k: int = DEFAULT_K) -> List[Tuple[int, int]]:
+        """Find the (at most) k other abstracts most similar to an indexed abstract"""
+        return self.query(self.get_counts(pmid), k=k, exclude_pmid=pmid)
+
+    def save(self, path: str):
+        """Save the index, including any abstracts added since the postings were built"""
+        self.build()
+
+        def write(temporary_path: Path):
+            with h5py.File(temporary_path, "w") as f:
+                save_vocabulary(f, self.terms, compression=None)
+
+                # the columns are stored contiguously, so that they load quickly
+                index = f.create_group(GROUP_INDEX)
+                index.attrs[ATTR_NUM_BUCKETS] = self.num_buckets or 0
+                for name in (
+                    "pmids",
+                    "document_offsets",
+                    "document_term_ids",
+                    "document_counts",
+                    "term_offsets",
+                    "posting_document_ids",
+                    "posting_counts",
+                ):
+                    create_column(index, name, getattr(self, name), None, dtype=np.int64)
+
+        write_atomically(Path(path), write)
+        log.info("saved index of %s abstracts to %s", len(self.pmids), path)
+
+    @classmethod
+    def load(cls, path: str) -> SimilarityIndex:
+        with h5py.File(Path(path), "r") as f:
+            terms = load_vocabulary(f)
+
+            index_group = f[GROUP_INDEX]
+            index = SimilarityIndex(num_buckets=int(index_group.attrs[ATTR_NUM_BUCKETS]) or None)
+            for name in index_group:
+                setattr(index, name, index_group[name][()])
+
+        index.terms = terms
+        index.term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        index.document_id_by_pmid = dict(zip(index.pmids.tolist(), range(len(index.pmids))))
+        return index
@@ -0,0 +1,206 @@
+from typing import List, Dict, Tuple, Any, Callable, Optional, Set
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, asdict
+from itertools import product
+from pathlib import Path
+import json
+
+from nltk.stem import WordNetLemmatizer
+from nltk.stem.snowball import EnglishStemmer
+from nltk.corpus import brown as nltk_filter_words
+
+from pubmed.abstract_lib import Abstract
+from pubmed.evaluation_lib import ClusteringEvaluation, evaluate_clustering
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from pubmed.scorer_lib import SCORERS
+from pubmed.token_processor_lib import TokenProcessor
+from analysis.data_processing_utils import DatasetDescriptor, get_abstracts, get_labeled_data, TAB
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+# the sources of each named parameter value, created in the worker processes
+FILTER_WORDS: Dict[str, Callable[[], Set[str]]] = {
+    "brown": lambda: set(nltk_filter_words.words()),
+    "none": set,
+}
+
+LEMMATIZERS: Dict[str, Callable[[], Optional[Callable]]] = {
+    "wordnet": lambda: WordNetLemmatizer().lemmatize,
+    "snowball": lambda: EnglishStemmer().stem,
+    "none": lambda: None,
+}
+
+
+@dataclass(frozen=True)
+class SweepConfiguration:
+    min_token_length: int = TokenProcessor.MIN_TOKEN_LENGTH
+    filter_words: str = "brown"
+    lemmatizer: str = "wordnet"
+    scorer: str = "simple"
+
+    @property
+    def tokenizer_key(self) -> Tuple[int, str, str]:
+        """The parameters that affect the language models"""
+        return self.min_token_length, self.filter_words, self.lemmatizer
+
+    def validate(self):
+        for f in fields(self):
+            value = getattr(self, f.name)
+            # json has no separate boolean type, but a bool is an int to python
+            if not isinstance(value, f.type) or isinstance(value, bool):
+                raise ValueError("{} must be of type {}: {!r}".format(f.name, f.type.__name__, value))
+
+        if self.min_token_length < 1:
+            raise ValueError("min_token_length must be positive: {}".format(self.min_token_length))
+
+        for name, value, choices in [
+            ("filter_words", self.filter_words, FILTER_WORDS),
+            ("lemmatizer", self.lemmatizer, LEMMATIZERS),
+            ("scorer", self.scorer, SCORERS),
+        ]:
+            if value not in choices:
+                raise ValueError("unknown {}: {} (choose from {})".format(name, value, sorted(choices)))
+
+
+@dataclass
+class SweepResult:
+    configuration: SweepConfiguration
+    evaluation: ClusteringEvaluation
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[SweepConfiguration]:
+    """Create a configuration for each combination of the parameter values of the grid, e.g.,
+    {"min_token_length": [2, 3], "lemmatizer": ["wordnet", "none"]}; unspecified parameters keep
+    their default values; the grid is validated before any configuration is evaluated"""
+    if not isinstance(grid, dict):
+        raise ValueError("the grid must map each parameter to a list of values: {!r}".format(grid))
+
+    names = [f.name for f in fields(SweepConfiguration)]
+    unknown_names = set(grid) - set(names)
+    if unknown_names:
+        raise ValueError("unknown parameters: {} (choose from {})".format(sorted(unknown_names), names))
+
+    for name, values in grid.items():
+        if not isinstance(values, list) or not values:
+            raise ValueError("{} must be a non-empty list of values: {!r}".format(name, values))
+
+    grid_names = [name for name in names if name in grid]
+    configurations = [
+        SweepConfiguration(**dict(zip(grid_names, values))) for values in product(*(grid[name] for name in grid_names))
+    ]
+    for configuration in configurations:
+        configuration.validate()
+
+    # the same configuration is only evaluated once
+    return list(dict.fromkeys(configurations))
+
+
+def load_grid(path: str) -> Dict[str, List[Any]]:
+    with Path(path).open() as f:
+        return json.load(f)
+
+
+def _build_language_models(
+    tokenizer_key: Tuple[int, str, str], texts: List[Tuple[int, str]]
+) -> Tuple[Tuple[int, str, str], List[Abstract]]:
+    """Build the language models of the abstracts for a tokenizer setting, in a worker process"""
+    min_token_length, filter_words, lemmatizer = tokenizer_key
+    language_model_builder = LanguageModelBuilder(
+        filter_words=FILTER_WORDS[filter_words](),
+        lemmatize=LEMMATIZERS[lemmatizer](),
+        min_token_length=min_token_length,
+    )
+
+    abstracts = []
+    for pmid, text in texts:
+        counts = language_model_builder.build_language_model(Abstract(pmid=pmid, text=text))
+        abstracts.append(Abstract.from_counts(pmid, counts))
+
+    return tokenizer_key, abstracts
+
+
+def _evaluate_configuration(
+    configuration: SweepConfiguration, abstracts: List[Abstract], expected_clusters: List[Set[int]]
+) -> SweepResult:
+    """Cluster the abstracts with the configuration's scorer and evaluate the clusters, in a worker
+    process"""
+    predicted_clusters = PubMedTermBasedClusterer.cluster_language_models(
+        abstracts, scorer=SCORERS[configuration.scorer]()
+    )
+
+    evaluation = evaluate_clustering(predicted_clusters, expected_clusters)
+    return SweepResult(configuration=configuration, evaluation=evaluation)
+
+
+class ParameterSweep:
+    """Evaluate configurations of the tokenizer and scorer against labeled data, memoizing the
+    output of each stage by the parameters that affect it: abstracts are loaded once, language
+    models are built once per tokenizer setting, and each configuration is clustered once"""
+
+    def __init__(self, num_workers: Optional[int] = None):
+        self.num_workers = num_workers
+
+    def run(self, dataset: DatasetDescriptor, configurations: List[SweepConfiguration]) -> List[SweepResult]:
+        """Evaluate the configurations, ranked from best to worst"""
+        pmids, expected_clusters = get_labeled_data(dataset)
+        texts = [(abstract.pmid, abstract.text) for abstract in get_abstracts(pmids)]
+
+        configurations_by_tokenizer_key: Dict[Tuple[int, str, str], List[SweepConfiguration]] = defaultdict(list)
+        for configuration in configurations:
+            configurations_by_tokenizer_key[configuration.tokenizer_key].append(configuration)
+
+        log.info(
+            "sweeping %s configurations over %s tokenizer settings for %s abstracts",
+            len(configurations),
+            len(configurations_by_tokenizer_key),
+            len(texts),
+        )
+
+        with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            language_model_futures = [
+                executor.submit(_build_language_models, tokenizer_key, texts)
+                for tokenizer_key in configurations_by_tokenizer_key
+            ]
+
+            # each configuration is evaluated as soon as the language models of its tokenizer are built
+            result_futures = []
+            for future in language_model_futures:
+                tokenizer_key, abstracts = future.result()
+                result_futures.extend(
+                    executor.submit(_evaluate_configuration, configuration, abstracts, expected_clusters)
+                    for configuration in configurations_by_tokenizer_key[tokenizer_key]
+                )
+
+            results = [future.result() for future in result_futures]
+
+        return self.rank(results)
+
+    @staticmethod
+    def rank(results: List[SweepResult]) -> List[SweepResult]:
+        return sorted(
+            results,
+            key=lambda result: (
+                result.evaluation.adjusted_rand_index,
+                result.evaluation.normalized_mutual_information,
+            ),
+            reverse=True,
+        )
+
+    @staticmethod
+    def write_results(results: List[SweepResult], path: str):
+        """Write the ranked results as a table of parameters and metrics"""
+        with Path(path).open("w") as f:
+            for rank, result in enumerate(results, start=1):
+                row = {"rank": rank, **asdict(result.configuration), **result.evaluation.to_dict()}
+                if rank == 1:
+                    f.write(TAB.join(row) + "\n")
+                f.write(TAB.join(_format_value(value) for value in row.values()) + "\n")
+
+
+def _format_value(value: Any) -> str:
+    return "{:.4f}".format(value) if isinstance(value, float) else str(value)
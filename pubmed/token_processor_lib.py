@@ -30,9 +30,12 @@ class TokenProcessor:
 
     ]
 
-    def __init__(self, filter_words: Set[str], lemmatize: Optional[Callable] = None):
+    def __init__(
+        self, filter_words: Set[str], lemmatize: Optional[Callable] = None, min_token_length: Optional[int] = None
+    ):
         self.filter_words = filter_words
         self.lemmatize = lemmatize
+        self.min_token_length = self.MIN_TOKEN_LENGTH if min_token_length is None else min_token_length
 
     @classmethod
     def is_numeric(cls, s: str) -> bool:
@@ -68,7 +71,7 @@ class TokenProcessor:
         return s.replace(DASH, "")
 
     def extract(self, s: str) -> Counter:
-        min_token_length = self.MIN_TOKEN_LENGTH
+        min_token_length = self.min_token_length
         filter_words = self.filter_words
 
         terms = Counter()
@@ -1,15 +1,20 @@
-from typing import Optional, List
+from typing import Optional, List, Iterable, Iterator, Callable
 
 from pathlib import Path
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, chain
+import os
+import click
 
 from nltk.stem import WordNetLemmatizer
 from nltk.corpus import brown as nltk_common_words
 
+from pubmed.pipeline_lib import AbstractPipeline, prefetch_map
 from pubmed.pubmed_extractor_lib import Abstract
 from pubmed.token_processor_lib import TokenProcessor
 from analysis.data_processing_utils import (
-    DatasetDescriptor, data_dir, get_pmids_from_unlabeled_file, get_abstracts, DASH, SPACE, TAB,
+    DatasetDescriptor, data_dir, get_pmids_from_unlabeled_file, get_abstracts, create_processor, DASH, SPACE, TAB,
 )
 
 import logging
@@ -22,26 +27,51 @@ dataset1 = DatasetDescriptor(Path(data_dir, "pmids_test_set_unlabeled.txt"), TAB
 dataset2 = DatasetDescriptor(Path(data_dir, "pmids_gold_set_unlabeled.txt"), TAB)
 dataset3 = DatasetDescriptor(Path(data_dir, "pmids_gold_set_labeled.txt"), TAB)
 
+DEFAULT_CHUNK_SIZE = 100
 
-def compile_text_from_abstracts(abstracts: List[Abstract]) -> str:
-    return " ".join(abstract.text for abstract in abstracts)
+# the token processor of each worker process, created once by the worker's initializer
+_worker_token_processor: Optional[TokenProcessor] = None
 
 
-def analyze(dataset: DatasetDescriptor, limit: Optional[int] = None):
-    pmids = get_pmids_from_unlabeled_file(dataset)
-    abstracts = get_abstracts(pmids, limit)
-
+def create_token_processor() -> TokenProcessor:
     lemmatize = WordNetLemmatizer().lemmatize
     filter_words = set(nltk_common_words.words())
 
-    token_processor = TokenProcessor(filter_words=filter_words, lemmatize=lemmatize)
-    corpus = compile_text_from_abstracts(abstracts)
+    return TokenProcessor(filter_words=filter_words, lemmatize=lemmatize)
+
+
+def compile_text_from_abstracts(abstracts: List[Abstract]) -> str:
+    return " ".join(abstract.text for abstract in abstracts)
 
+
+def count_terms(texts: Iterable[str], token_processor: TokenProcessor) -> Counter:
     counts = Counter()
-    for token in corpus.split(SPACE):
-        token_counts = token_processor.extract(token)
-        counts.update(token_counts)
+    for text in texts:
+        for token in text.split(SPACE):
+            token_counts = token_processor.extract(token)
+            counts.update(token_counts)
+    return counts
+
+
+def _init_worker(token_processor_factory: Callable[[], TokenProcessor]):
+    global _worker_token_processor
+    _worker_token_processor = token_processor_factory()
+
+
+def _count_terms_in_worker(texts: List[str]) -> Counter:
+    return count_terms(texts, _worker_token_processor)
+
 
+def _chunk(items: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def report_term_variants(counts: Counter):
     log.info("terms: %s", counts)
 
     terms = set(counts.keys())
@@ -57,5 +87,78 @@ def analyze(dataset: DatasetDescriptor, limit: Optional[int] = None):
     log.info("       diffs: {}".format(lowercase_terms - lowercase_nodash_terms))
 
 
+def analyze(
+    dataset: DatasetDescriptor,
+    limit: Optional[int] = None,
+    token_processor_factory: Callable[[], TokenProcessor] = create_token_processor,
+) -> Counter:
+    pmids = get_pmids_from_unlabeled_file(dataset)
+    abstracts = get_abstracts(pmids, limit)
+
+    token_processor = token_processor_factory()
+    corpus = compile_text_from_abstracts(abstracts)
+
+    counts = count_terms([corpus], token_processor)
+
+    report_term_variants(counts)
+    return counts
+
+
+def analyze_parallel(
+    datasets: List[DatasetDescriptor],
+    limit: Optional[int] = None,
+    num_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    token_processor_factory: Callable[[], TokenProcessor] = create_token_processor,
+) -> Counter:
+    """Produce the same report as `analyze` for one or more datasets, as if concatenated, without
+    concatenating the corpus: abstracts are streamed in chunks to worker processes, whose term
+    counts are merged; the factory of token processors must be picklable"""
+    # like `analyze`, an article listed twice is counted twice
+    pmids = chain.from_iterable(get_pmids_from_unlabeled_file(dataset) for dataset in datasets)
+
+    # the pipeline only retrieves abstracts, so it needs no language model builder
+    pipeline = AbstractPipeline(processor=create_processor(), language_model_builder=None)
+    texts = (abstract.text for abstract in pipeline.iter_abstracts(islice(pmids, limit)))
+
+    num_workers = num_workers or os.cpu_count() or 1
+
+    counts = Counter()
+    with ProcessPoolExecutor(
+        max_workers=num_workers, initializer=_init_worker, initargs=(token_processor_factory,)
+    ) as executor:
+        # bound the number of chunks in flight, so that the corpus is never held in memory
+        max_in_flight = 2 * num_workers
+        for chunk_counts in prefetch_map(
+            _count_terms_in_worker, _chunk(texts, chunk_size), executor=executor, max_in_flight=max_in_flight
+        ):
+            counts.update(chunk_counts)
+
+    report_term_variants(counts)
+    return counts
+
+
+@click.command()
+@click.argument("data_files", nargs=-1, type=click.Path(exists=True, dir_okay=False, readable=True))
+@click.option("--limit", type=int, help="Analyze at most this many abstracts.")
+@click.option("--parallel", is_flag=True, type=bool, help="Count terms in chunks across worker processes.")
+@click.option("--workers", type=int, help="Number of worker processes (defaults to the number of CPUs).")
+@click.option("--chunk-size", default=DEFAULT_CHUNK_SIZE, help="Abstracts per chunk sent to a worker.", type=int)
+def main(
+    data_files: List[str],
+    limit: Optional[int] = None,
+    parallel: bool = False,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+):
+    datasets = [DatasetDescriptor(Path(data_file), TAB) for data_file in data_files] or [dataset1]
+
+    if parallel:
+        analyze_parallel(datasets, limit=limit, num_workers=workers, chunk_size=chunk_size)
+    else:
+        for dataset in datasets:
+            analyze(dataset, limit=limit)
+
+
 if __name__ == "__main__":
-    analyze(dataset1)
+    main()
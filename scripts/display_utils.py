@@ -1,4 +1,7 @@
-from typing import List, Set, Dict, Any
+from typing import List, Set, Dict, Any, Optional, TextIO
+import json
+
+from pubmed.evaluation_lib import ClusteringEvaluation
 
 import logging
 
@@ -59,6 +62,32 @@ def display_predicted_clusters(clusters: List[Set[int]]):
     print("\n".join(groups))
 
 
+def display_evaluation_metrics(
+    evaluation: ClusteringEvaluation, output_format: str = "text", stream: Optional[TextIO] = None
+):
+    """Print the metrics to the stream or, by default, to the standard output"""
+    metrics = evaluation.to_dict()
+
+    if output_format == "json":
+        print(json.dumps(metrics, indent=2), file=stream)
+        return
+
+    width = max(len(name) for name in metrics)
+    lines = [
+        "  {name:<{width}}  {value}".format(
+            name=name, width=width, value="{:.4f}".format(value) if isinstance(value, float) else value
+        )
+        for name, value in metrics.items()
+    ]
+
+    print("\n\nevaluation metrics:\n", file=stream)
+    print("\n".join(lines), file=stream)
+
+
+# the bright foreground colors, other than white, which are cycled through
+COLOR_CODES = [91, 92, 93, 94, 95, 96]
+
+
 def color(i: int, s: Any) -> str:
-    code: int = 91 + i
+    code: int = COLOR_CODES[i % len(COLOR_CODES)]
     return "\033[{code}m {s}\033[00m".format(code=code, s=s)
@@ -1,12 +1,35 @@
 from __future__ import absolute_import
 
-from typing import Optional
+from typing import Optional, List, Set, Iterable, Iterator
 from pathlib import Path
+import json
+import sys
+import time
 import click
 
 from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
-from analysis.data_processing_utils import DatasetDescriptor, TAB
-from scripts.display_utils import display_evaluation_output, display_predicted_clusters
+from pubmed.duplicate_lib import DuplicateDetector
+from pubmed.document_frequency_lib import DocumentFrequencyFilter
+from pubmed.pubmed_extractor_lib import CachingPubMedProcessor
+from pubmed.language_model_builder import LanguageModelCache
+from pubmed.service_lib import ClusteringService
+from pubmed.batch_lib import BatchClusterer, expand_dataset_paths
+from pubmed.checkpoint_lib import ClusteringCheckpoint
+from pubmed.columnar_lib import save_language_models, load_language_models, save_assignments
+from pubmed.output_lib import STDOUT, WRITERS, open_cluster_writer
+from pubmed.similarity_index_lib import SimilarityIndex
+from pubmed.abstract_lib import Abstract
+from analysis.data_processing_utils import (
+    DatasetDescriptor,
+    create_processor,
+    get_labeled_data,
+    get_pmids_from_unlabeled_file,
+    iter_pmids_from_unlabeled_file,
+    TAB,
+)
+from pubmed.evaluation_lib import evaluate_clustering
+from pubmed.sweep_lib import ParameterSweep, expand_grid, load_grid
+from scripts.display_utils import display_evaluation_output, display_evaluation_metrics, display_predicted_clusters
 
 import logging
 
@@ -19,28 +42,425 @@ def cli():
     pass
 
 
+def create_document_frequency_filter(
+    min_df: Optional[int] = None, max_df: Optional[float] = None
+) -> Optional[DocumentFrequencyFilter]:
+    if min_df is None and max_df is None:
+        return None
+
+    if min_df is None:
+        min_df = DocumentFrequencyFilter.DEFAULT_MIN_DOCUMENT_FREQUENCY
+
+    try:
+        return DocumentFrequencyFilter(min_document_frequency=min_df, max_document_fraction=max_df)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+
+
 @cli.command("cluster")
 @click.argument("data_file", nargs=1, type=click.Path(exists=True, dir_okay=False, readable=True))
 @click.option("--evaluate", is_flag=True, type=bool)
+@click.option(
+    "--metrics-format",
+    default="text",
+    help="Format of the evaluation metrics.",
+    type=click.Choice(["text", "json", "none"]),
+)
 @click.option("--separator", default=TAB, help='Field separator (e.g., " " for a csv or "\\t" for a tsv.', type=str)
-def cluster(data_file: str, evaluate: bool = False, separator: Optional[str] = None):
+@click.option(
+    "--collapse-duplicates", is_flag=True, type=bool, help="Cluster only one representative of duplicate abstracts."
+)
+@click.option(
+    "--hash-buckets",
+    type=click.IntRange(min=1),
+    help="Hash the terms of each language model into this many buckets.",
+)
+@click.option(
+    "--negative-ttl",
+    default=CachingPubMedProcessor.DEFAULT_NEGATIVE_TTL,
+    help="Seconds before an article recorded as having no abstract is retried.",
+    type=float,
+)
+@click.option("--refresh-misses", is_flag=True, type=bool, help="Retry articles recorded as having no abstract.")
+@click.option("--checkpoint-dir", help="Directory to which progress is saved after each stage.", type=click.Path())
+@click.option(
+    "--checkpoint-block-size",
+    default=ClusteringCheckpoint.DEFAULT_BLOCK_SIZE,
+    help="Rows whose best matches are saved together.",
+    type=click.IntRange(min=1),
+)
+@click.option("--resume", is_flag=True, type=bool, help="Resume from the progress saved to the checkpoint directory.")
+@click.option(
+    "--output-format",
+    default="terminal",
+    help="Format of the clusters; all but terminal are written as each cluster is complete.",
+    type=click.Choice(["terminal"] + sorted(WRITERS)),
+)
+@click.option("--output", "output_path", help='File to which the clusters are written ("-" for stdout).', type=str)
+@click.option("--min-df", type=int, help="Drop terms of fewer abstracts (at least 2, if only --max-df is given).")
+@click.option("--max-df", type=float, help="Drop terms of more than this fraction of the abstracts.")
+@click.option(
+    "--time-limit",
+    type=float,
+    help="Seconds after which the clusters are returned, from the abstracts and best matches found so far.",
+)
+def cluster(
+    data_file: str,
+    evaluate: bool = False,
+    metrics_format: str = "text",
+    separator: Optional[str] = None,
+    collapse_duplicates: bool = False,
+    hash_buckets: Optional[int] = None,
+    negative_ttl: Optional[float] = None,
+    refresh_misses: bool = False,
+    checkpoint_dir: Optional[str] = None,
+    checkpoint_block_size: int = ClusteringCheckpoint.DEFAULT_BLOCK_SIZE,
+    resume: bool = False,
+    output_format: str = "terminal",
+    output_path: Optional[str] = None,
+    min_df: Optional[int] = None,
+    max_df: Optional[float] = None,
+    time_limit: Optional[float] = None,
+):
+
+    # the time limit includes retrieving the abstracts
+    deadline = time.monotonic() + time_limit if time_limit is not None else None
 
     data_descriptor = DatasetDescriptor(Path(data_file), separator=separator)
 
     clusterer = PubMedTermBasedClusterer(
-
+        language_model_builder=PubMedTermBasedClusterer.create_default_language_model_builder(num_buckets=hash_buckets),
+        duplicate_detector=DuplicateDetector() if collapse_duplicates else None,
+        processor=create_processor(negative_ttl=negative_ttl, refresh=refresh_misses),
+        document_frequency_filter=create_document_frequency_filter(min_df, max_df),
     )
 
+    if resume and not checkpoint_dir:
+        raise click.UsageError("--resume requires --checkpoint-dir")
+
+    checkpoint = None
+    if checkpoint_dir:
+        checkpoint = ClusteringCheckpoint(checkpoint_dir, block_size=checkpoint_block_size, resume=resume)
+
+    if output_format == "terminal" and output_path:
+        raise click.UsageError("--output requires an --output-format other than terminal")
+
+    if deadline is not None and checkpoint_dir:
+        raise click.UsageError("--time-limit cannot be combined with --checkpoint-dir")
+
+    def iter_clusters(pmids: Iterable[int]) -> Iterator[Set[int]]:
+        if deadline is None:
+            yield from clusterer.iter_clusters_from_pmids(pmids, checkpoint=checkpoint)
+            return
+
+        clustering = clusterer.predict_clusters_from_pmids_before(pmids, deadline=deadline)
+        log.info(
+            "found the best matches of %s of %s abstracts (%.1f%%) exactly within %ss",
+            clustering.num_refined,
+            clustering.num_rows,
+            100 * clustering.refined_fraction,
+            time_limit,
+        )
+        yield from clustering.clusters
+
     if evaluate:
-        predicted_clusters, expected_clusters = clusterer.predict_clusters_and_evaluate(data_descriptor)
+        pmids, expected_clusters = get_labeled_data(data_descriptor)
+    else:
+        pmids = iter_pmids_from_unlabeled_file(data_descriptor)
+
+    if output_format != "terminal":
+        # the clusters are retained only if they are to be evaluated
+        predicted_clusters: List[Set[int]] = []
+        with open_cluster_writer(output_format, output_path) as writer:
+            for predicted_cluster in iter_clusters(pmids):
+                writer.write_cluster(writer.num_clusters, predicted_cluster)
+                if evaluate:
+                    predicted_clusters.append(predicted_cluster)
+
+        if evaluate and metrics_format != "none":
+            # metrics are kept out of clusters written to the standard output, so that it can be parsed
+            metrics_stream = sys.stderr if output_path in (None, STDOUT) else None
+
+            evaluation = evaluate_clustering(predicted_clusters, expected_clusters)
+            display_evaluation_metrics(evaluation, output_format=metrics_format, stream=metrics_stream)
+
+    elif evaluate:
+        predicted_clusters = list(iter_clusters(pmids))
 
-        display_evaluation_output(predicted_clusters=predicted_clusters, expected_clusters=expected_clusters)
+        # json metrics are printed alone, so that the output can be parsed
+        if metrics_format != "json":
+            display_evaluation_output(predicted_clusters=predicted_clusters, expected_clusters=expected_clusters)
+
+        if metrics_format != "none":
+            evaluation = evaluate_clustering(predicted_clusters, expected_clusters)
+            display_evaluation_metrics(evaluation, output_format=metrics_format)
 
     else:
-        predicted_clusters = clusterer.predict_clusters(data_descriptor)
+        predicted_clusters = list(iter_clusters(pmids))
 
         display_predicted_clusters(clusters=predicted_clusters)
 
 
+@cli.command("serve")
+@click.option("--host", default="127.0.0.1", help="Host on which to listen for jobs.", type=str)
+@click.option("--port", default=8080, help="Port on which to listen for jobs.", type=int)
+@click.option("--socket", "socket_path", help="Unix socket on which to listen, instead of a port.", type=str)
+@click.option("--workers", default=ClusteringService.DEFAULT_NUM_WORKERS, help="Jobs to run concurrently.", type=int)
+@click.option(
+    "--hash-buckets",
+    type=click.IntRange(min=1),
+    help="Hash the terms of each language model into this many buckets.",
+)
+@click.option(
+    "--negative-ttl",
+    default=CachingPubMedProcessor.DEFAULT_NEGATIVE_TTL,
+    help="Seconds before an article recorded as having no abstract is retried.",
+    type=float,
+)
+def serve(
+    host: str,
+    port: int,
+    socket_path: Optional[str] = None,
+    workers: int = ClusteringService.DEFAULT_NUM_WORKERS,
+    hash_buckets: Optional[int] = None,
+    negative_ttl: Optional[float] = None,
+):
+    """Keep a clusterer warm and cluster jobs posted as JSON to /cluster, e.g.,
+    {"pmids": [...], "options": {"collapse_duplicates": true}}"""
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=PubMedTermBasedClusterer.create_default_language_model_builder(num_buckets=hash_buckets),
+        processor=create_processor(negative_ttl=negative_ttl),
+        language_model_cache=LanguageModelCache(),
+    )
+
+    service = ClusteringService(clusterer, num_workers=workers)
+    service.warm()
+
+    server = service.create_server(host=host, port=port, socket_path=socket_path)
+    log.info("serving on %s", socket_path or "{}:{}".format(host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+@cli.command("batch")
+@click.argument("patterns", nargs=-1, required=True, type=str)
+@click.option("--output-dir", required=True, help="Directory for the clusters of each dataset.", type=click.Path())
+@click.option(
+    "--workers", default=BatchClusterer.DEFAULT_NUM_WORKERS, help="Datasets to cluster concurrently.", type=int
+)
+@click.option(
+    "--collapse-duplicates", is_flag=True, type=bool, help="Cluster only one representative of duplicate abstracts."
+)
+@click.option(
+    "--hash-buckets",
+    type=click.IntRange(min=1),
+    help="Hash the terms of each language model into this many buckets.",
+)
+@click.option("--min-df", type=int, help="Drop terms of fewer abstracts (at least 2, if only --max-df is given).")
+@click.option("--max-df", type=float, help="Drop terms of more than this fraction of the abstracts.")
+def batch(
+    patterns: List[str],
+    output_dir: str,
+    workers: int = BatchClusterer.DEFAULT_NUM_WORKERS,
+    collapse_duplicates: bool = False,
+    hash_buckets: Optional[int] = None,
+    min_df: Optional[int] = None,
+    max_df: Optional[float] = None,
+):
+    """Cluster every dataset file matching the patterns with a single, shared clusterer"""
+    datasets = [DatasetDescriptor(path) for path in expand_dataset_paths(patterns)]
+
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=PubMedTermBasedClusterer.create_default_language_model_builder(num_buckets=hash_buckets),
+        duplicate_detector=DuplicateDetector() if collapse_duplicates else None,
+        document_frequency_filter=create_document_frequency_filter(min_df, max_df),
+    )
+
+    results = BatchClusterer(clusterer, num_workers=workers).run(datasets, output_dir=Path(output_dir))
+    for result in results:
+        print("{}: {} clusters -> {}".format(result.dataset.path, len(result.clusters), result.output_path))
+
+
+@cli.command("export")
+@click.argument("data_file", nargs=1, required=False, type=click.Path(exists=True, dir_okay=False, readable=True))
+@click.option("--separator", default=TAB, help='Field separator (e.g., " " for a csv or "\\t" for a tsv.', type=str)
+@click.option("--models", "models_path", help="File to which the language models are exported.", type=click.Path())
+@click.option("--assignments", "assignments_path", help="File to which the clusters are exported.", type=click.Path())
+@click.option(
+    "--from-models",
+    "from_models_path",
+    help="Previously exported language models to use instead of the data file.",
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+)
+@click.option("--no-compression", is_flag=True, type=bool, help="Store columns contiguously, for memory-mapping.")
+@click.option(
+    "--collapse-duplicates", is_flag=True, type=bool, help="Cluster only one representative of duplicate abstracts."
+)
+@click.option(
+    "--hash-buckets",
+    type=click.IntRange(min=1),
+    help="Hash the terms of each language model into this many buckets.",
+)
+def export(
+    data_file: Optional[str] = None,
+    separator: Optional[str] = None,
+    models_path: Optional[str] = None,
+    assignments_path: Optional[str] = None,
+    from_models_path: Optional[str] = None,
+    no_compression: bool = False,
+    collapse_duplicates: bool = False,
+    hash_buckets: Optional[int] = None,
+):
+    """Export the language models of the articles of a data file (PMID, term id, count) and their
+    cluster assignments (PMID, cluster id, best match, score) as compressed columns"""
+    if bool(data_file) == bool(from_models_path):
+        raise click.UsageError("specify either a data file or --from-models")
+
+    compression = None if no_compression else "gzip"
+
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=PubMedTermBasedClusterer.create_default_language_model_builder(num_buckets=hash_buckets),
+        duplicate_detector=DuplicateDetector() if collapse_duplicates else None,
+    )
+
+    if from_models_path:
+        # the language models are loaded as they were built, without tokenization
+        abstracts = load_language_models(from_models_path)
+    else:
+        data_descriptor = DatasetDescriptor(Path(data_file), separator=separator)
+        pmids = get_pmids_from_unlabeled_file(data_descriptor)
+        abstracts = clusterer.build_abstracts_from_pmids(pmids)
+
+    if models_path:
+        save_language_models(abstracts, models_path, compression=compression)
+
+    if assignments_path:
+        save_assignments(clusterer.build_assignments(abstracts), assignments_path, compression=compression)
+
+
+@cli.command("index")
+@click.argument("data_file", nargs=1, type=click.Path(exists=True, dir_okay=False, readable=True))
+@click.option("--index", "index_path", required=True, help="Index file to create or update.", type=click.Path())
+@click.option("--separator", default=TAB, help='Field separator (e.g., " " for a csv or "\\t" for a tsv.', type=str)
+@click.option(
+    "--hash-buckets",
+    type=click.IntRange(min=1),
+    help="Hash the terms of each language model into this many buckets.",
+)
+def index(data_file: str, index_path: str, separator: Optional[str] = None, hash_buckets: Optional[int] = None):
+    """Add the language models of the articles of a data file to a similarity index"""
+    if Path(index_path).exists():
+        similarity_index = SimilarityIndex.load(index_path)
+        if similarity_index.num_buckets != hash_buckets:
+            raise click.UsageError("the index was built with --hash-buckets {}".format(similarity_index.num_buckets))
+    else:
+        similarity_index = SimilarityIndex(num_buckets=hash_buckets)
+
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=PubMedTermBasedClusterer.create_default_language_model_builder(num_buckets=hash_buckets),
+    )
+
+    data_descriptor = DatasetDescriptor(Path(data_file), separator=separator)
+    pmids = get_pmids_from_unlabeled_file(data_descriptor)
+    similarity_index.add(clusterer.build_abstracts_from_pmids(pmids))
+    similarity_index.save(index_path)
+
+
+@cli.command("similar")
+@click.option(
+    "--index",
+    "index_path",
+    required=True,
+    help="Index file created by the index command.",
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+)
+@click.option("--pmid", "pmids", multiple=True, help="Article whose similar abstracts are found.", type=int)
+@click.option("--text", "texts", multiple=True, help="Abstract text whose similar abstracts are found.", type=str)
+@click.option(
+    "-k", "--top-k", default=SimilarityIndex.DEFAULT_K, help="Number of similar abstracts.", type=click.IntRange(min=1)
+)
+@click.option("--output-format", default="text", help="Format of the results.", type=click.Choice(["text", "jsonl"]))
+def similar(
+    index_path: str, pmids: List[int], texts: List[str], top_k: int = SimilarityIndex.DEFAULT_K, output_format="text"
+):
+    """Find the indexed abstracts most similar to articles or to abstract text"""
+    if not pmids and not texts:
+        raise click.UsageError("specify at least one --pmid or --text")
+
+    similarity_index = SimilarityIndex.load(index_path)
+
+    # the language models of articles outside the index, and of text, are built as were those of the index
+    missing_pmids = [pmid for pmid in pmids if pmid not in similarity_index]
+    counts_by_pmid = {}
+    text_counts = []
+    if missing_pmids or texts:
+        clusterer = PubMedTermBasedClusterer(
+            language_model_builder=PubMedTermBasedClusterer.create_default_language_model_builder(
+                num_buckets=similarity_index.num_buckets
+            ),
+        )
+        abstracts = clusterer.build_abstracts_from_pmids(missing_pmids)
+        counts_by_pmid = {abstract.pmid: abstract.counts for abstract in abstracts}
+        text_counts = [
+            clusterer.language_model_builder.build_language_model(Abstract(pmid=-1, text=text)) for text in texts
+        ]
+
+    queries = []
+    for pmid in pmids:
+        if pmid in similarity_index:
+            queries.append((pmid, similarity_index.query_pmid(pmid, k=top_k)))
+        elif pmid in counts_by_pmid:
+            queries.append((pmid, similarity_index.query(counts_by_pmid[pmid], k=top_k, exclude_pmid=pmid)))
+        else:
+            log.warning("no abstract: %s", pmid)
+
+    for i, counts in enumerate(text_counts):
+        queries.append(("text{}".format(i), similarity_index.query(counts, k=top_k)))
+
+    for query, results in queries:
+        if output_format == "jsonl":
+            print(json.dumps({"query": query, "similar": [{"pmid": pmid, "score": score} for pmid, score in results]}))
+        else:
+            print("{}:".format(query))
+            print("\n".join("  {}{}{}".format(pmid, TAB, score) for pmid, score in results))
+
+
+@cli.command("sweep")
+@click.argument("data_file", nargs=1, type=click.Path(exists=True, dir_okay=False, readable=True))
+@click.option(
+    "--grid",
+    "grid_file",
+    required=True,
+    help='JSON file of the values of each parameter, e.g., {"min_token_length": [2, 3], "lemmatizer": ["wordnet"]}.',
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+)
+@click.option("--output", required=True, help="File to which the ranked results are written.", type=click.Path())
+@click.option("--separator", default=TAB, help='Field separator (e.g., " " for a csv or "\\t" for a tsv.', type=str)
+@click.option("--workers", type=int, help="Number of worker processes (defaults to the number of CPUs).")
+def sweep(
+    data_file: str, grid_file: str, output: str, separator: Optional[str] = None, workers: Optional[int] = None
+):
+    """Evaluate each configuration of a parameter grid against a labeled data file"""
+    data_descriptor = DatasetDescriptor(Path(data_file), separator=separator)
+
+    # the grid is checked before any abstract is loaded
+    try:
+        configurations = expand_grid(load_grid(grid_file))
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--grid")
+
+    results = ParameterSweep(num_workers=workers).run(data_descriptor, configurations)
+    ParameterSweep.write_results(results, output)
+
+    best = results[0]
+    message = "best of {} configurations: {} (ARI {:.4f})"
+    print(message.format(len(results), best.configuration, best.evaluation.adjusted_rand_index))
+
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,113 @@
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import threading
+import time
+
+from pubmed.abstract_lib import Abstract
+from pubmed.async_clustering_lib import AsyncPubMedTermBasedClusterer
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from pubmed.pubmed_extractor_lib import CachingPubMedProcessor, PubMedProcessor
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+TEXT_BY_PMID = {
+    1: "turner syndrome coarctation aorta",
+    2: "turner syndrome karyotype aorta",
+    3: "glioma temozolomide methylation",
+    4: "glioma methylation tumour",
+}
+
+SLOW_PMID = 5
+
+
+class SlowProcessor(PubMedProcessor):
+    def __init__(self):
+        super().__init__()
+        self.requested_pmids = []
+        self.lock = threading.Lock()
+
+    def get_abstract(self, pmid: int) -> Abstract:
+        with self.lock:
+            self.requested_pmids.append(pmid)
+        time.sleep(1.0 if pmid == SLOW_PMID else 0.01)
+        return Abstract(pmid=pmid, text=TEXT_BY_PMID.get(pmid, "unknown"))
+
+
+@pytest.mark.unittest
+def test_async_clusterer(tmp_path):
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+    processor.processor = SlowProcessor()
+
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=LanguageModelBuilder(filter_words={"syndrome"}),
+        processor=processor,
+    )
+    async_clusterer = AsyncPubMedTermBasedClusterer(clusterer, fetch_timeout=0.5)
+
+    async def predict_concurrently():
+        pmids = [1, 2, 3, 4, SLOW_PMID]
+        return await asyncio.gather(*(async_clusterer.predict_clusters_from_pmids(pmids) for _ in range(2)))
+
+    # concurrent jobs share each fetch, and the article fetched too slowly is missing
+    first_clusters, second_clusters = asyncio.run(predict_concurrently())
+    assert first_clusters == second_clusters == [{1, 2}, {3, 4}]
+    assert sorted(processor.processor.requested_pmids) == [1, 2, 3, 4, SLOW_PMID]
+
+    abstracts = asyncio.run(async_clusterer.get_abstracts([4, 1]))
+    assert [abstract.pmid for abstract in abstracts] == [4, 1]
+
+    async_clusterer.shutdown()
+
+
+@pytest.mark.unittest
+def test_async_clusterer_in_process_pool(tmp_path):
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+    processor.processor = SlowProcessor()
+
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=LanguageModelBuilder(filter_words={"syndrome"}),
+        processor=processor,
+    )
+
+    # tokenization and clustering run in other processes, outside the GIL of the event loop
+    with ProcessPoolExecutor(max_workers=2) as cpu_executor:
+        async_clusterer = AsyncPubMedTermBasedClusterer(clusterer, cpu_executor=cpu_executor)
+        clusters = asyncio.run(async_clusterer.predict_clusters_from_pmids([1, 2, 3, 4]))
+        async_clusterer.shutdown()
+
+    assert clusters == [{1, 2}, {3, 4}]
+
+
+class QueuedProcessor(PubMedProcessor):
+    def get_abstract(self, pmid: int) -> Abstract:
+        time.sleep(0.2)
+        return Abstract(pmid=pmid, text="turner aorta")
+
+
+@pytest.mark.unittest
+def test_async_clusterer_times_fetches_from_their_start(tmp_path):
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+    processor.processor = QueuedProcessor()
+
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=LanguageModelBuilder(filter_words=set()), processor=processor
+    )
+    async_clusterer = AsyncPubMedTermBasedClusterer(clusterer, max_concurrent_fetches=2, fetch_timeout=0.5)
+
+    async def get_concurrently():
+        return await asyncio.gather(
+            async_clusterer.get_abstracts(range(10)), async_clusterer.get_abstracts(range(10, 20))
+        )
+
+    # many more fetches than threads, of two jobs, each fetch taking less than the timeout once started
+    first_abstracts, second_abstracts = asyncio.run(get_concurrently())
+    assert [abstract.pmid for abstract in first_abstracts] == list(range(10))
+    assert [abstract.pmid for abstract in second_abstracts] == list(range(10, 20))
+
+    async_clusterer.shutdown()
@@ -0,0 +1,52 @@
+from collections import Counter
+import random
+
+from pubmed.abstract_lib import Abstract
+from pubmed.best_match_lib import BoundedBestMatchSearch
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.unittest
+def test_bounded_best_match_search_matches_exhaustive_search():
+    clusterer = PubMedTermBasedClusterer(language_model_builder=LanguageModelBuilder(filter_words=set()))
+
+    rng = random.Random(0)
+    for _ in range(100):
+        # small vocabularies and counts produce many ties, and abstracts without shared terms
+        num_terms = rng.randint(1, 10)
+        abstracts = [
+            Abstract.from_counts(
+                pmid,
+                Counter({"t{}".format(rng.randrange(num_terms)): rng.randint(1, 3) for _ in range(rng.randint(0, 4))}),
+            )
+            for pmid in range(rng.randint(2, 20))
+        ]
+
+        search = BoundedBestMatchSearch(abstracts, clusterer.scorer)
+        for position, abstract in enumerate(abstracts):
+            best_abstract, score = search.find_best_match(position)
+            expected_best_abstract, expected_score = clusterer._find_best_match(abstract, abstracts)
+
+            assert best_abstract is expected_best_abstract
+            assert score == expected_score
+
+
+@pytest.mark.unittest
+def test_bounded_best_match_search_is_applicable():
+    clusterer = PubMedTermBasedClusterer(language_model_builder=LanguageModelBuilder(filter_words=set()))
+    abstracts = [Abstract.from_counts(1, Counter({"a": 1})), Abstract.from_counts(2, Counter({"a": 2}))]
+
+    assert BoundedBestMatchSearch.is_applicable(abstracts, clusterer.scorer)
+    assert not BoundedBestMatchSearch.is_applicable(abstracts[:1], clusterer.scorer)
+
+    # hashed language models may have negative counts
+    abstracts.append(Abstract.from_counts(3, Counter({17: -1})))
+    assert not BoundedBestMatchSearch.is_applicable(abstracts, clusterer.scorer)
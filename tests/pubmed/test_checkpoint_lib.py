@@ -0,0 +1,133 @@
+from collections import Counter
+import random
+
+from pubmed.abstract_lib import Abstract
+from pubmed.best_match_lib import BoundedBestMatchSearch
+from pubmed.checkpoint_lib import ClusteringCheckpoint, CheckpointMismatchException
+from pubmed.document_frequency_lib import DocumentFrequencyFilter
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from pubmed.pubmed_extractor_lib import CachingPubMedProcessor, PubMedProcessor
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.unittest
+def test_checkpoint_resume(tmp_path):
+    pmids = [26323199, 28403077, 30419345]
+
+    abstract = Abstract.from_counts(pmids[0], Counter({"turner": 2, "coarctation": 1}))
+
+    with pytest.raises(ValueError):
+        ClusteringCheckpoint(str(tmp_path), block_size=0)
+
+    checkpoint = ClusteringCheckpoint(str(tmp_path), block_size=2)
+    checkpoint.check_pmids(pmids)
+    checkpoint.check_options({"num_buckets": None, "max_document_fraction": 0.5})
+    checkpoint.save_language_models([abstract])
+    checkpoint.save_best_matches(0, num_abstracts=3, best_matches=[(1, 4.0), (0, 4.0)])
+
+    # resuming keeps the saved progress
+    checkpoint = ClusteringCheckpoint(str(tmp_path), block_size=2, resume=True)
+    checkpoint.check_pmids(pmids)
+    checkpoint.check_options({"max_document_fraction": 0.5, "num_buckets": None})
+    assert [abstract.counts for abstract in checkpoint.load_language_models()] == [abstract.counts]
+    assert checkpoint.load_best_matches(0, num_abstracts=3) == [(1, 4.0), (0, 4.0)]
+    assert checkpoint.load_best_matches(1, num_abstracts=3) is None
+
+    with pytest.raises(CheckpointMismatchException):
+        checkpoint.check_pmids(pmids[:2])
+    with pytest.raises(CheckpointMismatchException):
+        checkpoint.load_best_matches(0, num_abstracts=4)
+    with pytest.raises(CheckpointMismatchException, match="num_buckets"):
+        checkpoint.check_options({"num_buckets": 1024, "max_document_fraction": 0.5})
+
+    # not resuming discards it
+    checkpoint = ClusteringCheckpoint(str(tmp_path), block_size=2)
+    assert checkpoint.load_language_models() is None
+    assert checkpoint.load_best_matches(0, num_abstracts=3) is None
+    assert not list(tmp_path.iterdir())
+
+
+TOPICS = [
+    ["turner", "aorta", "coarctation", "karyotype", "mosaic"],
+    ["glioma", "temozolomide", "mgmt", "methylation", "tumour"],
+    ["breast", "triple", "negative", "her2", "carcinoma"],
+]
+
+
+class FakeProcessor(PubMedProcessor):
+    def get_abstract(self, pmid: int) -> Abstract:
+        rng = random.Random(pmid)
+        topic = TOPICS[pmid % len(TOPICS)]
+        return Abstract(pmid=pmid, text=" ".join(rng.choice(topic) for _ in range(8)))
+
+
+class UnavailableProcessor(PubMedProcessor):
+    def get_abstract(self, pmid: int) -> Abstract:
+        raise AssertionError("article {} retrieved when resuming".format(pmid))
+
+
+class Interruption(Exception):
+    pass
+
+
+class InterruptedCheckpoint(ClusteringCheckpoint):
+    """A checkpoint of a run interrupted before saving the best matches of the specified block"""
+
+    def __init__(self, *args, interrupted_block: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.interrupted_block = interrupted_block
+
+    def save_best_matches(self, block: int, **kwargs):
+        if block == self.interrupted_block:
+            raise Interruption()
+        super().save_best_matches(block, **kwargs)
+
+
+def create_clusterer(processor: PubMedProcessor, cache_dir: str, **kwargs) -> PubMedTermBasedClusterer:
+    caching_processor = CachingPubMedProcessor(cache_dir=cache_dir)
+    caching_processor.processor = processor
+    return PubMedTermBasedClusterer(
+        language_model_builder=LanguageModelBuilder(filter_words=set()), processor=caching_processor, **kwargs
+    )
+
+
+@pytest.mark.unittest
+def test_clustering_resumes_from_checkpoint(tmp_path, monkeypatch):
+    pmids = list(range(1, 31))
+    checkpoint_dir = str(tmp_path / "checkpoint")
+
+    expected_clusters = create_clusterer(FakeProcessor(), str(tmp_path / "cache")).predict_clusters_from_pmids(pmids)
+
+    checkpoint = InterruptedCheckpoint(checkpoint_dir, block_size=8, interrupted_block=2)
+    with pytest.raises(Interruption):
+        create_clusterer(FakeProcessor(), str(tmp_path / "interrupted_cache")).predict_clusters_from_pmids(
+            pmids, checkpoint=checkpoint
+        )
+
+    searched_positions = []
+    find_best_match = BoundedBestMatchSearch.find_best_match
+    monkeypatch.setattr(
+        BoundedBestMatchSearch,
+        "find_best_match",
+        lambda search, position: searched_positions.append(position) or find_best_match(search, position),
+    )
+
+    # the language models and the first two blocks of best matches are those saved
+    checkpoint = ClusteringCheckpoint(checkpoint_dir, block_size=8, resume=True)
+    clusterer = create_clusterer(UnavailableProcessor(), str(tmp_path / "resumed_cache"))
+    assert clusterer.predict_clusters_from_pmids(pmids, checkpoint=checkpoint) == expected_clusters
+    assert searched_positions == list(range(16, 30))
+
+    # progress saved with other options is never combined with progress made with these
+    clusterer = create_clusterer(
+        UnavailableProcessor(), str(tmp_path / "resumed_cache"), document_frequency_filter=DocumentFrequencyFilter()
+    )
+    with pytest.raises(CheckpointMismatchException, match="min_document_frequency"):
+        clusterer.predict_clusters_from_pmids(pmids, checkpoint=checkpoint)
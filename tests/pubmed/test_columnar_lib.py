@@ -0,0 +1,58 @@
+from collections import Counter
+
+from pubmed.abstract_lib import Abstract
+from pubmed.cluster_lib import Assignment
+from pubmed.columnar_lib import (
+    save_language_models, load_language_models, save_assignments, load_assignments, memory_map_column,
+)
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.unittest
+def test_language_models_round_trip(tmp_path):
+    abstracts = [
+        Abstract.from_counts(26323199, Counter({"Turner": 8, "turner": 8, "coarctation": 6, "karyotype-confirmed": 1})),
+        Abstract.from_counts(28403077, Counter()),
+        Abstract.from_counts(30419345, Counter({"coarctation": 1, "β-catenin": 2})),
+    ]
+
+    for compression in ["gzip", None]:
+        path = str(tmp_path / "models-{}.h5".format(compression))
+        save_language_models(abstracts, path, compression=compression)
+
+        loaded_abstracts = load_language_models(path)
+
+        assert [abstract.pmid for abstract in loaded_abstracts] == [abstract.pmid for abstract in abstracts]
+        assert [abstract.counts for abstract in loaded_abstracts] == [abstract.counts for abstract in abstracts]
+
+    assert memory_map_column(path, "models/count").tolist() == [8, 8, 6, 1, 1, 2]
+
+
+@pytest.mark.unittest
+def test_hashed_language_models_round_trip(tmp_path):
+    abstracts = [Abstract.from_counts(1, Counter({3: 2, 17: -1})), Abstract.from_counts(2, Counter({17: 4}))]
+
+    path = str(tmp_path / "models.h5")
+    save_language_models(abstracts, path)
+
+    assert [abstract.counts for abstract in load_language_models(path)] == [abstract.counts for abstract in abstracts]
+
+
+@pytest.mark.unittest
+def test_assignments_round_trip(tmp_path):
+    assignments = [
+        Assignment(pmid=1, cluster_id=0, best_match=2, score=12.0),
+        Assignment(pmid=2, cluster_id=0, best_match=1, score=12.0),
+        Assignment(pmid=3, cluster_id=1, best_match=None, score=0.0),
+    ]
+
+    path = str(tmp_path / "assignments.h5")
+    save_assignments(assignments, path)
+
+    assert load_assignments(path) == assignments
@@ -0,0 +1,41 @@
+from collections import Counter
+
+from pubmed.abstract_lib import Abstract
+from pubmed.document_frequency_lib import DocumentFrequencyFilter
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.unittest
+def test_document_frequency_filter():
+    shared_counts = Counter({"patient": 3, "turner": 2, "karyotype": 1})
+    abstracts = [
+        Abstract.from_counts(1, shared_counts),
+        Abstract.from_counts(2, Counter({"patient": 1, "turner": 1})),
+        Abstract.from_counts(3, Counter({"patient": 2, "glioma": 4})),
+        Abstract.from_counts(4, Counter({"patient": 1, "glioma": 1})),
+    ]
+
+    report = DocumentFrequencyFilter(min_document_frequency=2, max_document_fraction=0.75).prune(abstracts)
+
+    # "karyotype" occurs in a single abstract, and "patient" in every abstract
+    assert [abstract.counts for abstract in abstracts] == [
+        Counter({"turner": 2}),
+        Counter({"turner": 1}),
+        Counter({"glioma": 4}),
+        Counter({"glioma": 1}),
+    ]
+    assert (report.num_terms, report.num_terms_kept) == (4, 2)
+    assert (report.num_nonzeros, report.num_nonzeros_kept) == (9, 4)
+    assert report.vocabulary_reduction == pytest.approx(0.5)
+
+    # language models, which may be shared with a cache, are replaced rather than changed
+    assert shared_counts == Counter({"patient": 3, "turner": 2, "karyotype": 1})
+
+    with pytest.raises(ValueError):
+        DocumentFrequencyFilter(max_document_fraction=0)
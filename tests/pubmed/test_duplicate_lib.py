@@ -0,0 +1,72 @@
+from collections import Counter
+
+from pubmed.abstract_lib import Abstract
+from pubmed.duplicate_lib import DuplicateDetector
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.unittest
+def test_duplicate_detector_collapse():
+    turner_counts = Counter({
+        "turner": 8, "coarctation": 6, "aorta": 5, "karyotype": 2, "mosaicism": 1, "cohort": 3, "utah": 1,
+        "hypoplasia": 1, "prenatally": 1, "bicommissural": 1, "chromosomal": 1, "livebirths": 1,
+    })
+    near_duplicate_counts = turner_counts + Counter({"erratum": 1})
+    unrelated_counts = Counter({"glioblastoma": 4, "temozolomide": 3, "mgmt": 2, "methylation": 2})
+
+    abstracts = [
+        Abstract.from_counts(1, turner_counts),
+        Abstract.from_counts(2, unrelated_counts),
+        Abstract.from_counts(3, Counter(turner_counts)),
+        Abstract.from_counts(4, near_duplicate_counts),
+        Abstract.from_counts(5, Counter()),
+        Abstract.from_counts(6, Counter()),
+    ]
+
+    detector = DuplicateDetector()
+    duplicates_of = detector.collapse(abstracts)
+
+    assert [abstract.pmid for abstract in duplicates_of] == [1, 2, 5, 6]
+    assert {abstract.pmid for abstract in duplicates_of[abstracts[0]]} == {3, 4}
+
+    clusters = [{abstracts[0]}, {abstracts[1], abstracts[4]}, {abstracts[5]}]
+    clusters = [detector.expand(cluster, duplicates_of) for cluster in clusters]
+    assert [{abstract.pmid for abstract in cluster} for cluster in clusters] == [{1, 3, 4}, {2, 5}, {6}]
+
+
+@pytest.mark.unittest
+def test_clusterer_restores_collapsed_duplicates():
+    turner_counts = Counter({"turner": 3, "coarctation": 2, "aorta": 2})
+    glioma_counts = Counter({"glioma": 3, "temozolomide": 2, "methylation": 2})
+    abstracts = [
+        Abstract.from_counts(1, turner_counts),
+        Abstract.from_counts(2, glioma_counts),
+        Abstract.from_counts(3, Counter(turner_counts)),
+        Abstract.from_counts(4, turner_counts + Counter({"karyotype": 1})),
+        Abstract.from_counts(5, glioma_counts + Counter({"tumour": 2})),
+    ]
+
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=LanguageModelBuilder(filter_words=set()), duplicate_detector=DuplicateDetector()
+    )
+
+    # the duplicates are clustered with their representative
+    clusters = clusterer.build_clusters(abstracts)
+    assert sorted(sorted(abstract.pmid for abstract in cluster) for cluster in clusters) == [[1, 3, 4], [2, 5]]
+
+    best_match_by_pmid = {
+        assignment.pmid: assignment.best_match for assignment in clusterer.build_assignments(abstracts)
+    }
+    assert best_match_by_pmid[3] == 1
+
+    # a lone representative keeps its duplicates
+    clusters = clusterer.build_clusters(abstracts[:1] + abstracts[2:3])
+    assert [{abstract.pmid for abstract in cluster} for cluster in clusters] == [{1, 3}]
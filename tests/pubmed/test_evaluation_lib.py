@@ -0,0 +1,46 @@
+from pubmed.evaluation_lib import evaluate_clustering
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.unittest
+def test_evaluate_clustering():
+    expected_clusters = [{1, 2, 3}, {4, 5, 6}]
+    predicted_clusters = [{1, 2}, {3, 4}, {5, 6}]
+
+    evaluation = evaluate_clustering(predicted_clusters, expected_clusters)
+
+    assert evaluation.num_pmids == 6
+    assert evaluation.adjusted_rand_index == pytest.approx(0.242424, abs=1e-6)
+    assert evaluation.homogeneity == pytest.approx(0.666667, abs=1e-6)
+    assert evaluation.completeness == pytest.approx(0.420620, abs=1e-6)
+    assert evaluation.v_measure == pytest.approx(0.515804, abs=1e-6)
+    assert evaluation.normalized_mutual_information == pytest.approx(0.515804, abs=1e-6)
+    assert evaluation.purity == pytest.approx(5 / 6)
+    assert evaluation.pairwise_precision == pytest.approx(2 / 3)
+    assert evaluation.pairwise_recall == pytest.approx(2 / 6)
+
+
+@pytest.mark.unittest
+def test_evaluate_clustering_perfect():
+    expected_clusters = [{1, 2, 3}, {4, 5}, {6}]
+
+    # the order of clusters is irrelevant, as are pmids that are not expected (e.g., 7)
+    evaluation = evaluate_clustering([{6}, {5, 4, 7}, {3, 2, 1}], expected_clusters)
+
+    assert evaluation.num_pmids == 6
+    for value in [
+        evaluation.adjusted_rand_index,
+        evaluation.normalized_mutual_information,
+        evaluation.homogeneity,
+        evaluation.completeness,
+        evaluation.purity,
+        evaluation.pairwise_precision,
+        evaluation.pairwise_recall,
+    ]:
+        assert value == pytest.approx(1.0)
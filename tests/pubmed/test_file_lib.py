@@ -0,0 +1,44 @@
+from pathlib import Path
+import threading
+import time
+
+from pubmed import file_lib
+from pubmed.file_lib import file_lock
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize("has_fcntl", [True, False])
+def test_file_lock_excludes_threads(tmp_path, monkeypatch, has_fcntl):
+    if not has_fcntl:
+        monkeypatch.setattr(file_lib, "fcntl", None)
+
+    paths = [Path(tmp_path, ".{}.lock".format(i)) for i in range(3)]
+    holders = {path: [] for path in paths}
+    overlapping = []
+
+    def hold(path: Path):
+        for _ in range(5):
+            with file_lock(path):
+                holders[path].append(threading.get_ident())
+                if len(holders[path]) > 1:
+                    overlapping.append(path)
+                time.sleep(0.001)
+                holders[path].remove(threading.get_ident())
+
+    threads = [threading.Thread(target=hold, args=(path,)) for path in paths for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not overlapping
+    # neither lock files nor thread locks outlive their holders
+    assert not list(Path(tmp_path).iterdir())
+    assert file_lib._thread_locks == {}
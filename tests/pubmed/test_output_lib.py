@@ -0,0 +1,34 @@
+from io import StringIO
+import json
+
+from pubmed.output_lib import JsonlClusterWriter, TextClusterWriter, TsvClusterWriter
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.unittest
+def test_cluster_writers():
+    clusters = [{3, 1}, {2}]
+
+    stream = StringIO()
+    assert TsvClusterWriter(stream).write_clusters(clusters) == 2
+    assert stream.getvalue() == "0\t1\n0\t3\n1\t2\n"
+
+    stream = StringIO()
+    JsonlClusterWriter(stream).write_clusters(clusters)
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [
+        {"cluster_id": 0, "pmids": [1, 3]},
+        {"cluster_id": 1, "pmids": [2]},
+    ]
+
+    # clusters written one at a time continue the numbering
+    stream = StringIO()
+    writer = TextClusterWriter(stream)
+    writer.write_cluster(writer.num_clusters, {5, 4})
+    writer.write_clusters([{6}])
+    assert stream.getvalue() == "  P0: 4 5\n  P1: 6\n"
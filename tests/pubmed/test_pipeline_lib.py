@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+import random
+import threading
+import time
+
+from pubmed.abstract_lib import Abstract
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pipeline_lib import AbstractPipeline, prefetch_map, threaded_stage
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from pubmed.pubmed_extractor_lib import AbstractProcessingException
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+TEXT_BY_PMID = {
+    1: "turner coarctation aorta",
+    2: "turner karyotype aorta",
+    3: "glioma temozolomide methylation",
+    4: "glioma methylation tumour",
+}
+
+MISSING_PMID = 5
+
+
+class FakeProcessor:
+    def __init__(self):
+        self.cache = {}
+
+    def get_miss(self, pmid: int) -> bool:
+        return False
+
+    def get_abstract(self, pmid: int) -> Abstract:
+        # fetches complete out of order
+        time.sleep(random.uniform(0, 0.01))
+        if pmid not in TEXT_BY_PMID:
+            raise AbstractProcessingException("no abstract for {}".format(pmid))
+        return Abstract(pmid=pmid, text=TEXT_BY_PMID[pmid])
+
+
+def wait_for_threads(num_threads: int, timeout: float = 5.0) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if threading.active_count() <= num_threads:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.mark.unittest
+def test_stages_preserve_order():
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(prefetch_map(lambda i: time.sleep(random.uniform(0, 0.005)) or i, range(100), executor, 16))
+    assert results == list(range(100))
+
+    assert list(threaded_stage(iter(range(100)), max_queue_size=4)) == list(range(100))
+
+
+@pytest.mark.unittest
+def test_stages_raise_in_consumer():
+    def fail_on_three(i: int) -> int:
+        if i == 3:
+            raise ValueError("three")
+        return i
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = prefetch_map(fail_on_three, range(10), executor, 4)
+        assert [next(results) for _ in range(3)] == [0, 1, 2]
+        with pytest.raises(ValueError):
+            next(results)
+
+    def produce():
+        yield 1
+        raise KeyError("producer")
+
+    results = threaded_stage(produce(), max_queue_size=4)
+    assert next(results) == 1
+    with pytest.raises(KeyError):
+        next(results)
+
+
+@pytest.mark.unittest
+def test_stages_are_bounded():
+    produced = []
+
+    def produce():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    results = threaded_stage(produce(), max_queue_size=4)
+    assert next(results) == 0
+    time.sleep(0.2)
+    # the item consumed, those buffered, and the one waiting for room
+    assert len(produced) <= 1 + 4 + 1
+    results.close()
+
+    called = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = prefetch_map(called.append, range(1000), executor, 8)
+        next(results)
+        time.sleep(0.1)
+        assert len(called) <= 8
+        results.close()
+
+
+@pytest.mark.unittest
+def test_pipeline_shuts_down_when_consumer_stops():
+    num_threads = threading.active_count()
+
+    pipeline = AbstractPipeline(processor=FakeProcessor(), language_model_builder=None, max_queue_size=2)
+    abstracts = pipeline.iter_abstracts(pmid for _ in range(1000) for pmid in TEXT_BY_PMID)
+    assert next(abstracts).pmid == 1
+    abstracts.close()
+
+    assert wait_for_threads(num_threads)
+
+
+@pytest.mark.unittest
+def test_pipeline_language_models():
+    pipeline = AbstractPipeline(
+        processor=FakeProcessor(), language_model_builder=LanguageModelBuilder(filter_words=set())
+    )
+
+    # missing articles are skipped, and repeated articles are represented once
+    abstracts = list(pipeline.iter_language_models([4, 1, MISSING_PMID, 2, 1, 3, 4]))
+    assert [abstract.pmid for abstract in abstracts] == [4, 1, 2, 3]
+    assert all(not abstract.fields and abstract.counts for abstract in abstracts)
+
+    clusterer = PubMedTermBasedClusterer(language_model_builder=LanguageModelBuilder(filter_words=set()))
+    clusters = clusterer.build_clusters(abstracts)
+    assert sorted(sorted(abstract.pmid for abstract in cluster) for cluster in clusters) == [[1, 2], [3, 4]]
@@ -1,4 +1,5 @@
 from pathlib import Path
+from collections import Counter
 
 from nltk.stem.wordnet import WordNetLemmatizer
 from nltk.stem.snowball import EnglishStemmer
@@ -118,3 +119,36 @@ def test_token_processor_snowball():
 
     assert not missing_terms, missing_terms
     assert not unexpected_terms, unexpected_terms
+
+
+@pytest.mark.unittest
+def test_language_model_builder_hashed():
+    pmid = 26323199
+    num_buckets = 64
+
+    test_path = Path(test_data_dir, "{}.xml".format(pmid))
+
+    xml = open(test_path).read()
+    processor = PubMedProcessor()
+    abstract = processor.create_abstract_from_xml(pmid, xml)
+
+    filter_words = {"the", "of", "with", "and", "were"}
+
+    counts = LanguageModelBuilder(filter_words=filter_words).build_language_model(abstract)
+    hashed_counts = LanguageModelBuilder(filter_words=filter_words, num_buckets=num_buckets).build_language_model(
+        abstract
+    )
+
+    assert all(isinstance(bucket, int) and 0 <= bucket < num_buckets for bucket in hashed_counts)
+    assert hashed_counts == LanguageModelBuilder.hash_language_model(counts, num_buckets)
+
+    # hashing halves of the model independently and merging them produces the same vector
+    terms = sorted(counts)
+    first_half = Counter({term: counts[term] for term in terms[::2]})
+    second_half = Counter({term: counts[term] for term in terms[1::2]})
+    merged_counts = LanguageModelBuilder.merge_language_models(
+        LanguageModelBuilder.hash_language_model(first_half, num_buckets),
+        LanguageModelBuilder.hash_language_model(second_half, num_buckets),
+    )
+
+    assert merged_counts == hashed_counts
@@ -0,0 +1,83 @@
+from collections import Counter
+import random
+import time
+
+from pubmed.abstract_lib import Abstract
+from pubmed.best_match_lib import BoundedBestMatchSearch
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from pubmed.pubmed_extractor_lib import CachingPubMedProcessor, PubMedProcessor
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+TEXT_BY_PMID = {
+    1: "turner coarctation aorta",
+    2: "turner karyotype aorta",
+    3: "glioma temozolomide methylation",
+    4: "glioma methylation tumour",
+}
+
+SLOW_PMIDS = [5, 6]
+
+
+class SlowProcessor(PubMedProcessor):
+    def get_abstract(self, pmid: int) -> Abstract:
+        if pmid in SLOW_PMIDS:
+            time.sleep(1.0)
+            return Abstract(pmid=pmid, text="turner glioma")
+        return Abstract(pmid=pmid, text=TEXT_BY_PMID[pmid])
+
+
+@pytest.mark.unittest
+def test_build_clusters_before_deadline():
+    clusterer = PubMedTermBasedClusterer(language_model_builder=LanguageModelBuilder(filter_words=set()))
+
+    rng = random.Random(1)
+    abstracts = [
+        Abstract.from_counts(pmid, Counter({"t{}".format(rng.randrange(8)): rng.randint(1, 3) for _ in range(4)}))
+        for pmid in range(30)
+    ]
+    expected_clusters = [{abstract.pmid for abstract in cluster} for cluster in clusterer.build_clusters(abstracts)]
+
+    # given time, every best match is found exactly
+    clustering = clusterer.build_clusters_before(abstracts, deadline=time.monotonic() + 60)
+    assert clustering.clusters == expected_clusters
+    assert clustering.num_rows == clustering.num_refined == len(abstracts)
+    assert clustering.refined_fraction == 1.0
+
+    # past the deadline, no best match is even approximated, yet every abstract is clustered once
+    clustering = clusterer.build_clusters_before(abstracts, deadline=time.monotonic() - 1)
+    assert clustering.num_rows == len(abstracts)
+    assert clustering.num_refined == 0
+    assert sorted(pmid for cluster in clustering.clusters for pmid in cluster) == list(range(len(abstracts)))
+
+    search = BoundedBestMatchSearch(abstracts, clusterer.scorer)
+    for position, abstract in enumerate(abstracts):
+        best_abstract, score = search.find_approximate_best_match(position)
+        assert best_abstract is not abstract
+        assert score == clusterer.scorer.get_score(target_abstract=abstract, model_abstract=best_abstract)
+        assert search.find_first_other_match(position)[0] is not abstract
+
+
+@pytest.mark.unittest
+def test_predict_clusters_before_deadline_leaves_out_articles_not_retrieved(tmp_path):
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+    processor.processor = SlowProcessor()
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=LanguageModelBuilder(filter_words=set()), processor=processor
+    )
+
+    # the articles retrieved after the deadline are left out, rather than delaying the clusters further
+    pmids = [1, 2, *SLOW_PMIDS, 3, 4]
+    clustering = clusterer.predict_clusters_from_pmids_before(pmids, deadline=time.monotonic() + 0.5)
+    assert sorted(sorted(cluster) for cluster in clustering.clusters) == [[1, 2]]
+    assert clustering.num_rows == 2
+
+    clustering = clusterer.predict_clusters_from_pmids_before([1, 2, 3, 4], deadline=time.monotonic() + 60)
+    assert sorted(sorted(cluster) for cluster in clustering.clusters) == [[1, 2], [3, 4]]
+    assert clustering.num_refined == 4
@@ -2,7 +2,9 @@ from pathlib import Path
 
 from bs4 import BeautifulSoup
 
-from pubmed.pubmed_extractor_lib import PubMedProcessor, Abstract
+from pubmed.pubmed_extractor_lib import (
+    PubMedProcessor, CachingPubMedProcessor, AbstractProcessingException, Abstract,
+)
 
 import pytest
 
@@ -98,3 +100,111 @@ def test_pubmed_xml_processor_create_abstract_live():
 
     assert abstract.text == expected_abstract.text
 
+
+class MissingAbstractProcessor(PubMedProcessor):
+    def __init__(self):
+        super().__init__()
+        self.requested_pmids = []
+
+    def get_abstract(self, pmid: int) -> Abstract:
+        self.requested_pmids.append(pmid)
+        raise AbstractProcessingException("no abstract found in article {}".format(pmid))
+
+
+@pytest.mark.unittest
+def test_caching_processor_negative_cache(tmp_path):
+    pmid = 12345
+
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+    processor.processor = MissingAbstractProcessor()
+
+    with pytest.raises(AbstractProcessingException):
+        processor.get_abstract(pmid)
+    assert processor.processor.requested_pmids == [pmid]
+
+    # a new processor loads the miss and skips the article without retrieving it
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+    processor.processor = MissingAbstractProcessor()
+
+    assert "no abstract found" in processor.get_miss(pmid).reason
+    with pytest.raises(AbstractProcessingException):
+        processor.get_abstract(pmid)
+    assert processor.processor.requested_pmids == []
+
+    # expired and refreshed entries are retried
+    for processor in [
+        CachingPubMedProcessor(cache_dir=str(tmp_path), negative_ttl=0),
+        CachingPubMedProcessor(cache_dir=str(tmp_path), refresh=True),
+    ]:
+        processor.processor = MissingAbstractProcessor()
+
+        assert processor.get_miss(pmid) is None
+        with pytest.raises(AbstractProcessingException):
+            processor.get_abstract(pmid)
+        assert processor.processor.requested_pmids == [pmid]
+
+
+@pytest.mark.unittest
+def test_caching_processor_quarantines_corrupt_entries(tmp_path):
+    Abstract(pmid=26323199, text="Turner syndrome").save(str(tmp_path))
+
+    # a partially written entry, and one holding another article
+    Path(tmp_path, "28403077.h5").write_bytes(Path(tmp_path, "26323199.h5").read_bytes()[:100])
+    Path(tmp_path, "30419345.h5").write_bytes(Path(tmp_path, "26323199.h5").read_bytes())
+
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+
+    assert list(processor.cache) == [26323199]
+    assert sorted(path.name for path in Path(tmp_path, processor.QUARANTINE_DIRNAME).iterdir()) == [
+        "28403077.h5",
+        "30419345.h5",
+    ]
+
+
+@pytest.mark.unittest
+def test_caching_processor_negative_cache_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(CachingPubMedProcessor, "NEGATIVE_CACHE_MIN_RECORDS_TO_COMPACT", 10)
+
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+    other_processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+
+    path = Path(tmp_path, processor.NEGATIVE_CACHE_FILENAME)
+    for pmid in range(8):
+        processor._add_to_negative_cache(pmid, reason="no abstract")
+    assert len(path.read_text().splitlines()) == 8
+
+    # a line left incomplete by an interrupted process is skipped, and terminated by the next record
+    with path.open("a") as f:
+        f.write('{"pmid": 100, "rea')
+    processor._remove_from_negative_cache(0)
+    assert sorted(processor.negative_cache) == list(range(1, 8))
+
+    # other processes read only the records appended since they last read the journal
+    with other_processor._negative_cache_lock:
+        other_processor._read_negative_cache()
+    assert sorted(other_processor.negative_cache) == list(range(1, 8))
+
+    # records are compacted once they are both numerous and mostly superseded
+    for pmid in range(1, 7):
+        processor._remove_from_negative_cache(pmid)
+        assert len(path.read_text().splitlines()) <= max(10, 2 * len(processor.negative_cache))
+    assert sorted(processor.negative_cache) == [7]
+
+    with other_processor._negative_cache_lock:
+        other_processor._read_negative_cache()
+    assert sorted(other_processor.negative_cache) == [7]
+    assert sorted(CachingPubMedProcessor(cache_dir=str(tmp_path)).negative_cache) == [7]
+
+
+@pytest.mark.unittest
+def test_caching_processor_quarantines_unreadable_negative_cache(tmp_path):
+    # a journal that cannot be read, here since a directory stands in its place
+    path = Path(tmp_path, CachingPubMedProcessor.NEGATIVE_CACHE_FILENAME)
+    path.mkdir()
+
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path))
+    assert processor.negative_cache == {}
+    assert Path(tmp_path, processor.QUARANTINE_DIRNAME, path.name).is_dir()
+
+    processor._add_to_negative_cache(1, reason="no abstract")
+    assert sorted(CachingPubMedProcessor(cache_dir=str(tmp_path)).negative_cache) == [1]
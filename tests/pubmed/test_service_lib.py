@@ -0,0 +1,149 @@
+from typing import Any, Dict, Optional, Tuple
+import http.client
+import json
+import socket
+import threading
+
+from pubmed.abstract_lib import Abstract
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from pubmed.pubmed_extractor_lib import AbstractProcessingException, CachingPubMedProcessor, PubMedProcessor
+from pubmed.service_lib import ClusteringService
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+TEXT_BY_PMID = {
+    1: "turner coarctation aorta",
+    2: "turner karyotype aorta",
+    3: "glioma temozolomide methylation",
+    4: "glioma methylation tumour",
+}
+
+MISSING_PMID = 5
+
+FAILING_PMID = 6
+
+
+class FakeProcessor(PubMedProcessor):
+    def get_abstract(self, pmid: int) -> Abstract:
+        if pmid == FAILING_PMID:
+            raise RuntimeError("service unavailable")
+        if pmid not in TEXT_BY_PMID:
+            raise AbstractProcessingException("no abstract found in article {}".format(pmid))
+        return Abstract(pmid=pmid, text=TEXT_BY_PMID[pmid])
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str):
+        super().__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def create_service(tmp_path) -> ClusteringService:
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path / "cache"))
+    processor.processor = FakeProcessor()
+
+    clusterer = PubMedTermBasedClusterer(
+        language_model_builder=LanguageModelBuilder(filter_words=set()), processor=processor
+    )
+    service = ClusteringService(clusterer, num_workers=2)
+    service.warm()
+    return service
+
+
+def request(
+    connection: http.client.HTTPConnection, method: str, path: str, body: Optional[Any] = None
+) -> Tuple[int, Dict[str, Any]]:
+    if body is not None and not isinstance(body, bytes):
+        body = json.dumps(body).encode("utf-8")
+    connection.request(method, path, body=body)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def check_requests(service: ClusteringService, create_connection):
+    connection = create_connection()
+
+    assert request(connection, "GET", "/health") == (200, {"status": "ok"})
+
+    status, result = request(connection, "POST", "/cluster", {"pmids": [1, 2, 3, 4, MISSING_PMID]})
+    assert status == 200
+    assert sorted(result["clusters"]) == [[1, 2], [3, 4]]
+    assert result["missing"] == [MISSING_PMID]
+
+    status, result = request(
+        connection, "POST", "/cluster", {"pmids": [1, 2, 3], "options": {"collapse_duplicates": True}}
+    )
+    assert status == 200
+    assert sorted(pmid for cluster in result["clusters"] for pmid in cluster) == [1, 2, 3]
+
+    # malformed jobs are rejected before they are submitted
+    for body in [b"not json", {"pmids": []}, {"pmids": [1], "options": {"unknown": 1}}, {"pmids": ["a"]}]:
+        status, result = request(connection, "POST", "/cluster", body)
+        assert status == 400
+        assert result["error"]
+
+    status, result = request(connection, "POST", "/cluster", {"pmids": [1, FAILING_PMID]})
+    assert status == 500
+    assert "service unavailable" in result["error"]
+
+    assert request(connection, "GET", "/unknown")[0] == 404
+    assert request(connection, "POST", "/unknown", {})[0] == 404
+
+    status, metrics = request(connection, "GET", "/metrics")
+    assert status == 200
+    assert metrics["jobs_submitted"] == 3
+    assert metrics["jobs_completed"] == 2
+    assert metrics["jobs_failed"] == 1
+    assert metrics["jobs_queued"] == metrics["jobs_running"] == 0
+    assert 0 <= metrics["latency_p50"] <= metrics["latency_max"]
+
+    connection.close()
+
+
+def serve(service: ClusteringService, **address) -> Tuple[Any, threading.Thread]:
+    server = service.create_server(**address)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def stop(service: ClusteringService, server, thread: threading.Thread):
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    service.shutdown()
+
+
+@pytest.mark.unittest
+def test_service_on_port(tmp_path):
+    service = create_service(tmp_path)
+
+    # an ephemeral port
+    server, thread = serve(service, host="127.0.0.1", port=0)
+    try:
+        host, port = server.server_address
+        check_requests(service, lambda: http.client.HTTPConnection(host, port, timeout=10))
+    finally:
+        stop(service, server, thread)
+
+
+@pytest.mark.unittest
+def test_service_on_unix_socket(tmp_path):
+    service = create_service(tmp_path)
+
+    socket_path = str(tmp_path / "service.sock")
+    server, thread = serve(service, socket_path=socket_path)
+    try:
+        check_requests(service, lambda: UnixHTTPConnection(socket_path))
+    finally:
+        stop(service, server, thread)
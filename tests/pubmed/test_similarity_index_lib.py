@@ -0,0 +1,50 @@
+from collections import Counter
+
+from pubmed.abstract_lib import Abstract
+from pubmed.similarity_index_lib import SimilarityIndex
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.unittest
+def test_similarity_index(tmp_path):
+    index = SimilarityIndex()
+    index.add(
+        [
+            Abstract.from_counts(1, Counter({"turner": 2, "aorta": 1})),
+            Abstract.from_counts(2, Counter({"turner": 1, "karyotype": 3})),
+            Abstract.from_counts(3, Counter({"glioma": 4})),
+            Abstract.from_counts(4, Counter({"aorta": 2})),
+        ]
+    )
+    index.build()
+
+    # scores are the dot products of the language models, ties broken by the order of indexing
+    assert index.query_pmid(1) == [(2, 2), (4, 2)]
+    assert index.query_pmid(1, k=1) == [(2, 2)]
+    assert index.query(Counter({"glioma": 1, "unknown": 5})) == [(3, 4)]
+    assert index.query(Counter({"unknown": 1})) == []
+    for k in [0, -1]:
+        with pytest.raises(ValueError):
+            index.query_pmid(1, k=k)
+
+    # abstracts added, or replaced, since the postings were built are found before the next build
+    index.add([Abstract.from_counts(5, Counter({"aorta": 5})), Abstract.from_counts(4, Counter({"glioma": 1}))])
+    assert index.pending
+    assert len(index) == 5
+    assert index.query_pmid(1) == [(5, 5), (2, 2)]
+
+    path = str(tmp_path / "index.h5")
+    index.save(path)
+    loaded_index = SimilarityIndex.load(path)
+
+    assert not index.pending
+    assert len(loaded_index) == 5
+    assert loaded_index.get_counts(4) == Counter({"glioma": 1})
+    assert loaded_index.query_pmid(1) == [(5, 5), (2, 2)]
+    assert loaded_index.query_pmid(3) == [(4, 4)]
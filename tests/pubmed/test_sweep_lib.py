@@ -0,0 +1,165 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import random
+
+from pubmed.abstract_lib import Abstract
+from pubmed.evaluation_lib import ClusteringEvaluation
+from pubmed.pubmed_extractor_lib import CachingPubMedProcessor, PubMedProcessor
+from pubmed.scorer_lib import BaseScorer
+from pubmed.sweep_lib import ParameterSweep, SweepConfiguration, SweepResult, expand_grid
+from analysis.data_processing_utils import DatasetDescriptor
+import pubmed.sweep_lib as sweep_lib
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+TOPICS = [
+    ["turner", "aorta", "coarctation", "karyotype", "mosaic"],
+    ["glioma", "temozolomide", "mgmt", "methylation", "tumour"],
+    ["breast", "triple", "negative", "her2", "carcinoma"],
+]
+
+NUM_PMIDS = 24
+
+
+class FakeProcessor(PubMedProcessor):
+    def get_abstract(self, pmid: int) -> Abstract:
+        rng = random.Random(pmid)
+        return Abstract(pmid=pmid, text=" ".join(rng.choice(TOPICS[pmid % len(TOPICS)]) for _ in range(8)))
+
+
+class ConstantScorer(BaseScorer):
+    """Scores every pair alike, leaving the clusters to the order of the abstracts"""
+
+    def get_score(self, target_abstract: Abstract, model_abstract: Abstract) -> float:
+        return 0
+
+
+def create_result(configuration: SweepConfiguration, adjusted_rand_index: float, nmi: float) -> SweepResult:
+    evaluation = ClusteringEvaluation(
+        num_pmids=10,
+        num_predicted_clusters=3,
+        num_expected_clusters=2,
+        adjusted_rand_index=adjusted_rand_index,
+        normalized_mutual_information=nmi,
+        homogeneity=1.0,
+        completeness=0.5,
+        v_measure=2 / 3,
+        purity=1.0,
+        pairwise_precision=1.0,
+        pairwise_recall=0.25,
+        pairwise_f1=0.4,
+    )
+    return SweepResult(configuration=configuration, evaluation=evaluation)
+
+
+@pytest.mark.unittest
+def test_expand_grid():
+    configurations = expand_grid({"lemmatizer": ["wordnet", "none", "wordnet"], "min_token_length": [2, 3]})
+
+    # in the order of the fields, without repetition, and with the unspecified parameters defaulted
+    assert configurations == [
+        SweepConfiguration(min_token_length=2, lemmatizer="wordnet"),
+        SweepConfiguration(min_token_length=2, lemmatizer="none"),
+        SweepConfiguration(min_token_length=3, lemmatizer="wordnet"),
+        SweepConfiguration(min_token_length=3, lemmatizer="none"),
+    ]
+    assert expand_grid({}) == [SweepConfiguration()]
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize(
+    "grid, message",
+    [
+        (["min_token_length"], "must map each parameter"),
+        ({"min_token_lenght": [2]}, "unknown parameters"),
+        ({"min_token_length": 2}, "non-empty list"),
+        ({"lemmatizer": []}, "non-empty list"),
+        ({"min_token_length": ["2"]}, "min_token_length must be of type int"),
+        ({"min_token_length": [True]}, "min_token_length must be of type int"),
+        ({"min_token_length": [0]}, "must be positive"),
+        ({"lemmatizer": [None]}, "lemmatizer must be of type str"),
+        ({"scorer": ["cosine"]}, "unknown scorer"),
+        ({"filter_words": ["brown", "nltk"]}, "unknown filter_words"),
+    ],
+)
+def test_expand_grid_validates_values(grid, message):
+    with pytest.raises(ValueError, match=message):
+        expand_grid(grid)
+
+
+@pytest.mark.unittest
+def test_rank_and_write_results(tmp_path):
+    first, second, third = expand_grid({"min_token_length": [2, 3, 4]})
+    results = ParameterSweep.rank(
+        [create_result(first, 0.5, 0.7), create_result(second, 0.9, 0.1), create_result(third, 0.5, 0.8)]
+    )
+
+    # by adjusted rand index, then by normalized mutual information
+    assert [result.configuration for result in results] == [second, third, first]
+
+    path = str(tmp_path / "sweep.tsv")
+    ParameterSweep.write_results(results, path)
+
+    header, *rows = [line.split("\t") for line in open(path).read().splitlines()]
+    assert header[:6] == ["rank", "min_token_length", "filter_words", "lemmatizer", "scorer", "num_pmids"]
+    assert [row[:2] for row in rows] == [["1", "3"], ["2", "4"], ["3", "2"]]
+    assert rows[0][header.index("adjusted_rand_index")] == "0.9000"
+    assert rows[0][header.index("v_measure")] == "0.6667"
+
+
+@pytest.mark.unittest
+def test_parameter_sweep_run(tmp_path, monkeypatch):
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path / "cache"))
+    processor.processor = FakeProcessor()
+    monkeypatch.setattr("analysis.data_processing_utils.create_processor", lambda: processor)
+    monkeypatch.setitem(sweep_lib.SCORERS, "constant", ConstantScorer)
+
+    path = Path(tmp_path, "labeled.txt")
+    path.write_text("".join("{}\t{}\n".format(pmid, pmid % len(TOPICS)) for pmid in range(1, NUM_PMIDS)))
+    dataset = DatasetDescriptor(path)
+
+    # tokens shorter than 20 characters are dropped by the second tokenizer setting, leaving no terms
+    configurations = expand_grid(
+        {
+            "min_token_length": [2, 20],
+            "filter_words": ["none"],
+            "lemmatizer": ["none"],
+            "scorer": ["simple", "constant"],
+        }
+    )
+    assert len(configurations) == 4
+
+    # in threads, so that the language models built can be counted
+    built_tokenizer_keys = Counter()
+    build_language_models = sweep_lib._build_language_models
+
+    def count_build_language_models(tokenizer_key, texts):
+        built_tokenizer_keys[tokenizer_key] += 1
+        return build_language_models(tokenizer_key, texts)
+
+    with monkeypatch.context() as context:
+        context.setattr(sweep_lib, "ProcessPoolExecutor", ThreadPoolExecutor)
+        context.setattr(sweep_lib, "_build_language_models", count_build_language_models)
+        results = ParameterSweep(num_workers=2).run(dataset, configurations)
+
+    # the language models of each tokenizer setting are built once, for both scorers
+    assert built_tokenizer_keys == Counter({(2, "none", "none"): 1, (20, "none", "none"): 1})
+
+    assert {result.configuration for result in results} == set(configurations)
+    assert results == ParameterSweep.rank(results)
+    assert results[0].configuration == SweepConfiguration(
+        min_token_length=2, filter_words="none", lemmatizer="none", scorer="simple"
+    )
+    assert results[0].evaluation.purity == 1.0
+    assert results[-1].evaluation.adjusted_rand_index < results[0].evaluation.adjusted_rand_index
+
+    # worker processes produce the same results
+    process_results = ParameterSweep(num_workers=2).run(dataset, configurations)
+    assert [result.configuration for result in process_results] == [result.configuration for result in results]
+    assert [result.evaluation for result in process_results] == [result.evaluation for result in results]
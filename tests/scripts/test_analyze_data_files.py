@@ -0,0 +1,57 @@
+from functools import partial
+from pathlib import Path
+
+from analysis.data_processing_utils import DatasetDescriptor
+from pubmed.abstract_lib import Abstract
+from pubmed.pubmed_extractor_lib import AbstractProcessingException, CachingPubMedProcessor, PubMedProcessor
+from pubmed.token_processor_lib import TokenProcessor
+from scripts.analyze_data_files import analyze, analyze_parallel
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+TEXT_BY_PMID = {
+    1: "The MGMT-promoter methylation (in 45% of gliomas) predicts temozolomide response.",
+    2: "Turner syndrome: coarctation of the aorta, and 45,X karyotype in TS patients.",
+    3: "HER2-negative, triple-negative breast carcinoma; her2 and Her-2 status.",
+    4: "Insulin, glucose and HbA1c in type-2 diabetes [T2D] treated with metformin.",
+    5: "IL-6 and TNF-α levels in the serum of patients with Turner syndrome.",
+}
+
+MISSING_PMID = 6
+
+
+class FakeProcessor(PubMedProcessor):
+    def get_abstract(self, pmid: int) -> Abstract:
+        if pmid not in TEXT_BY_PMID:
+            raise AbstractProcessingException("no abstract found in article {}".format(pmid))
+        return Abstract(pmid=pmid, text=TEXT_BY_PMID[pmid])
+
+
+@pytest.mark.unittest
+def test_analyze_parallel_equals_analyze(tmp_path, monkeypatch):
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path / "cache"))
+    processor.processor = FakeProcessor()
+    for module in ["scripts.analyze_data_files", "analysis.data_processing_utils"]:
+        monkeypatch.setattr("{}.create_processor".format(module), lambda: processor)
+
+    # an article listed twice, and one without an abstract
+    path = Path(tmp_path, "pmids.txt")
+    path.write_text("".join("{}\n".format(pmid) for pmid in [3, 1, 2, 3, MISSING_PMID, 5, 4]))
+    dataset = DatasetDescriptor(path)
+
+    # a token processor needing no nltk corpora, which worker processes can unpickle
+    token_processor_factory = partial(TokenProcessor, filter_words={"the", "and", "with"})
+
+    for limit in [None, 4]:
+        counts = analyze(dataset, limit=limit, token_processor_factory=token_processor_factory)
+        parallel_counts = analyze_parallel(
+            [dataset], limit=limit, num_workers=2, chunk_size=2, token_processor_factory=token_processor_factory
+        )
+
+        assert counts
+        assert parallel_counts == counts
@@ -0,0 +1,214 @@
+from pathlib import Path
+import json
+import random
+
+from click.testing import CliRunner
+
+from pubmed.abstract_lib import Abstract
+from pubmed.columnar_lib import load_language_models
+from pubmed.language_model_builder import LanguageModelBuilder
+from pubmed.pubmed_clustering_lib import PubMedTermBasedClusterer
+from pubmed.pubmed_extractor_lib import CachingPubMedProcessor, PubMedProcessor
+from pubmed.similarity_index_lib import SimilarityIndex
+import scripts.predict as predict
+
+import pytest
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+TOPICS = [
+    ["turner", "aorta", "coarctation", "karyotype", "mosaic"],
+    ["glioma", "temozolomide", "mgmt", "methylation", "tumour"],
+    ["breast", "triple", "negative", "her2", "carcinoma"],
+]
+
+NUM_PMIDS = 30
+
+
+def create_text(pmid: int) -> str:
+    rng = random.Random(pmid)
+    topic = TOPICS[pmid % len(TOPICS)]
+    return " ".join([rng.choice(topic) for _ in range(8)] + ["term{}".format(rng.randrange(20))])
+
+
+class FakeProcessor(PubMedProcessor):
+    def get_abstract(self, pmid: int) -> Abstract:
+        return Abstract(pmid=pmid, text=create_text(pmid))
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch) -> CachingPubMedProcessor:
+    """A processor of generated abstracts, and a language model builder needing no nltk corpora, for
+    every command"""
+    processor = CachingPubMedProcessor(cache_dir=str(tmp_path / "cache"))
+    processor.processor = FakeProcessor()
+
+    for module in ["scripts.predict", "pubmed.batch_lib", "pubmed.pubmed_clustering_lib"]:
+        monkeypatch.setattr("{}.create_processor".format(module), lambda **kwargs: processor)
+    monkeypatch.setattr(
+        PubMedTermBasedClusterer,
+        "create_default_language_model_builder",
+        staticmethod(lambda num_buckets=None: LanguageModelBuilder(filter_words=set(), num_buckets=num_buckets)),
+    )
+    return processor
+
+
+def write_dataset(path: Path, pmids, labeled: bool = False) -> str:
+    with path.open("w") as f:
+        for pmid in pmids:
+            f.write("{}\t{}\n".format(pmid, pmid % len(TOPICS)) if labeled else "{}\n".format(pmid))
+    return str(path)
+
+
+def create_runner() -> CliRunner:
+    # stderr is kept apart from stdout by default from click 8.2, and only on request before
+    try:
+        return CliRunner(mix_stderr=False)
+    except TypeError:
+        return CliRunner()
+
+
+def invoke(*args: str):
+    result = create_runner().invoke(predict.cli, list(args), catch_exceptions=False)
+    assert result.exit_code == 0, result.stdout + result.stderr
+    return result
+
+
+@pytest.mark.unittest
+def test_batch_equals_cluster(tmp_path, processor):
+    dataset_paths = [
+        write_dataset(tmp_path / "first.txt", range(1, 20)),
+        write_dataset(tmp_path / "second.txt", range(10, NUM_PMIDS)),
+    ]
+
+    output_dir = tmp_path / "batch"
+    invoke("batch", str(tmp_path / "*.txt"), "--output-dir", str(output_dir), "--min-df", "2")
+
+    for dataset_path in dataset_paths:
+        cluster_path = str(tmp_path / "cluster.tsv")
+        invoke("cluster", dataset_path, "--output-format", "tsv", "--output", cluster_path, "--min-df", "2")
+
+        batch_path = Path(output_dir, Path(dataset_path).name + predict.BatchClusterer.OUTPUT_SUFFIX)
+        assert batch_path.read_text() == Path(cluster_path).read_text()
+
+
+@pytest.mark.unittest
+def test_sweep_rejects_invalid_grid(tmp_path, processor):
+    dataset_path = write_dataset(tmp_path / "labeled.txt", range(1, 10), labeled=True)
+    grid_path = tmp_path / "grid.json"
+    grid_path.write_text('{"lemmatiser": ["wordnet"]}')
+
+    result = create_runner().invoke(
+        predict.cli, ["sweep", dataset_path, "--grid", str(grid_path), "--output", str(tmp_path / "sweep.tsv")]
+    )
+    assert result.exit_code == 2
+    assert "unknown parameters" in result.stderr
+    assert not list(Path(processor.cache_dir).glob("*.h5"))
+
+
+@pytest.mark.unittest
+def test_cluster_keeps_metrics_out_of_streamed_clusters(tmp_path, processor):
+    dataset_path = write_dataset(tmp_path / "labeled.txt", range(1, NUM_PMIDS), labeled=True)
+
+    # clusters written to the standard output leave the metrics to the standard error
+    for output in [[], ["--output", "-"]]:
+        result = invoke("cluster", dataset_path, "--evaluate", "--output-format", "tsv", *output)
+        rows = [line.split("\t") for line in result.stdout.splitlines()]
+        assert sorted(int(pmid) for _, pmid in rows) == list(range(1, NUM_PMIDS))
+        assert "evaluation metrics" in result.stderr
+
+    result = invoke("cluster", dataset_path, "--evaluate", "--metrics-format", "json", "--output-format", "jsonl")
+    clusters = [json.loads(line) for line in result.stdout.splitlines()]
+    assert sorted(pmid for cluster in clusters for pmid in cluster["pmids"]) == list(range(1, NUM_PMIDS))
+    assert json.loads(result.stderr)["num_pmids"] == NUM_PMIDS - 1
+
+    # clusters written to a file leave the standard output to the metrics
+    output_path = str(tmp_path / "clusters.tsv")
+    result = invoke("cluster", dataset_path, "--evaluate", "--output-format", "tsv", "--output", output_path)
+    assert len(Path(output_path).read_text().splitlines()) == NUM_PMIDS - 1
+    assert "evaluation metrics" in result.stdout
+
+
+@pytest.mark.unittest
+def test_cluster_within_time_limit(tmp_path, processor):
+    dataset_path = write_dataset(tmp_path / "labeled.txt", range(1, NUM_PMIDS), labeled=True)
+    args = ["cluster", dataset_path, "--evaluate", "--output-format", "tsv"]
+
+    # given time, the clusters are those found without a limit, written and evaluated alike
+    result = invoke(*args)
+    limited_result = invoke(*args, "--time-limit", "60")
+    assert limited_result.stdout == result.stdout
+    assert "evaluation metrics" in limited_result.stderr
+
+
+@pytest.mark.unittest
+def test_cluster_rejects_invalid_hash_buckets(tmp_path, processor):
+    dataset_path = write_dataset(tmp_path / "unlabeled.txt", range(1, 10))
+
+    result = create_runner().invoke(predict.cli, ["cluster", dataset_path, "--hash-buckets", "0"])
+    assert result.exit_code == 2
+    assert "--hash-buckets" in result.stderr
+
+
+@pytest.mark.unittest
+def test_batch_separates_datasets_of_the_same_name(tmp_path, processor):
+    first_path = tmp_path / "first" / "pmids.txt"
+    second_path = tmp_path / "second" / "pmids.txt"
+    for path, pmids in [(first_path, range(1, 20)), (second_path, range(10, NUM_PMIDS))]:
+        path.parent.mkdir()
+        write_dataset(path, pmids)
+
+    output_dir = tmp_path / "batch"
+    invoke("batch", str(tmp_path / "*" / "pmids.txt"), str(first_path), "--output-dir", str(output_dir))
+
+    # each is written under the name of its directory, and the one listed twice is clustered once
+    for name, dataset_path in [("first", first_path), ("second", second_path)]:
+        cluster_path = str(tmp_path / "cluster.tsv")
+        invoke("cluster", str(dataset_path), "--output-format", "tsv", "--output", cluster_path)
+
+        batch_path = Path(output_dir, name, "pmids.txt" + predict.BatchClusterer.OUTPUT_SUFFIX)
+        assert batch_path.read_text() == Path(cluster_path).read_text()
+    assert sorted(path.name for path in output_dir.iterdir()) == ["first", "second"]
+
+
+@pytest.mark.unittest
+def test_commands_read_data_files_alike(tmp_path, processor):
+    # a PMID, then a note, in each row
+    dataset_path = str(tmp_path / "pmids.txt")
+    Path(dataset_path).write_text("".join("{} note\n".format(pmid) for pmid in range(1, 10)))
+
+    result = invoke("cluster", dataset_path, "--output-format", "tsv")
+    pmids = sorted(int(row.split("\t")[1]) for row in result.stdout.splitlines())
+    assert pmids == list(range(1, 10))
+
+    models_path = str(tmp_path / "models.h5")
+    invoke("export", dataset_path, "--models", models_path)
+    assert sorted(abstract.pmid for abstract in load_language_models(models_path)) == pmids
+
+    index_path = str(tmp_path / "index.h5")
+    invoke("index", dataset_path, "--index", index_path)
+    assert all(pmid in SimilarityIndex.load(index_path) for pmid in pmids)
+
+
+@pytest.mark.unittest
+def test_similar_rejects_invalid_top_k(tmp_path, processor):
+    dataset_path = write_dataset(tmp_path / "unlabeled.txt", range(1, 10))
+    index_path = str(tmp_path / "index.h5")
+    invoke("index", dataset_path, "--index", index_path)
+
+    result = create_runner().invoke(predict.cli, ["similar", "--index", index_path, "--pmid", "1", "-k", "-1"])
+    assert result.exit_code == 2
+    assert "--top-k" in result.stderr
+
+
+@pytest.mark.unittest
+def test_cluster_rejects_invalid_checkpoint_block_size(tmp_path, processor):
+    dataset_path = write_dataset(tmp_path / "unlabeled.txt", range(1, 10))
+
+    args = ["cluster", dataset_path, "--checkpoint-dir", str(tmp_path / "checkpoint"), "--checkpoint-block-size", "0"]
+    result = create_runner().invoke(predict.cli, args)
+    assert result.exit_code == 2
+    assert "--checkpoint-block-size" in result.stderr